@@ -0,0 +1,288 @@
+"""Versioned, compressed, checksummed store for processed pipeline outputs.
+
+Each artifact lives in its own directory under data/processed/:
+
+    data/processed/olist_model_ready/
+        manifest.json
+        olist_model_ready.v0007.csv.zst
+        olist_model_ready.v0006.csv.zst
+        ...
+
+Writes go to a temporary file that is renamed into place only once it is
+complete, and manifest.json is replaced the same way afterwards, so a crashed
+run never leaves a half-written file for the next stage: readers keep seeing
+the previous version. The manifest records schema, row count, sha256, codec
+and the producing stage with a hash of its source and of the scripts/ modules
+it imports, and the last KEEP_VERSIONS versions are retained.
+
+Compression uses zstd (`zstandard`, listed in requirements.txt), or lz4 when
+only `lz4` is installed; gzip is a fallback. OLIST_ARTIFACT_CODEC=
+zstd|lz4|gzip|none overrides the choice; uncompressed ("none") artifacts are
+read through a memory map.
+"""
+import ast
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import warnings
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+PROCESSED_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+KEEP_VERSIONS = int(os.environ.get("OLIST_KEEP_VERSIONS", "3"))
+
+EXTENSIONS = {"zstd": ".csv.zst", "lz4": ".csv.lz4", "gzip": ".csv.gz", "none": ".csv"}
+
+
+def default_codec():
+    requested = os.environ.get("OLIST_ARTIFACT_CODEC")
+    if requested:
+        if requested not in EXTENSIONS:
+            raise ValueError(f"Unknown OLIST_ARTIFACT_CODEC: {requested}")
+        return requested
+    for codec, module in [("zstd", "zstandard"), ("lz4", "lz4.frame")]:
+        try:
+            __import__(module)
+            return codec
+        except ImportError:
+            continue
+    warnings.warn("zstandard is not installed (see requirements.txt); writing artifacts with gzip", stacklevel=2)
+    return "gzip"
+
+
+def _open_binary(path, mode, codec):
+    if codec == "zstd":
+        import zstandard
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=3) if "w" in mode else None)
+    if codec == "lz4":
+        import lz4.frame
+        return lz4.frame.open(path, mode)
+    if codec == "gzip":
+        return gzip.open(path, mode, compresslevel=3) if "w" in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _artifact_dir(name, root=None):
+    return os.path.join(root or PROCESSED_DIR, name)
+
+
+def _replace_atomic(src, dst):
+    with open(src, "r+b") as f:
+        os.fsync(f.fileno())
+    os.replace(src, dst)
+
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _script_path(module):
+    path = os.path.join(SCRIPTS_DIR, f"{module}.py")
+    return path if os.path.exists(path) else None
+
+
+def local_dependencies(module):
+    """scripts/ modules imported by scripts/<module>.py, directly or through each other."""
+    seen, todo = set(), [module]
+    while todo:
+        path = _script_path(todo.pop())
+        if path is None:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name.split(".")[0] for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module.split(".")[0]]
+            else:
+                continue
+            for name in names:
+                if name not in seen and name != module and _script_path(name):
+                    seen.add(name)
+                    todo.append(name)
+    return sorted(seen)
+
+
+def stage_version(stage, modules=None):
+    """Short hash of scripts/<stage>.py and the local modules it imports.
+
+    The manifest therefore changes when the stage or any helper it uses
+    (features.py, geo_index.py, ...) changes. `modules` overrides the
+    dependency scan with an explicit list of scripts/ module names.
+    """
+    path = _script_path(stage)
+    if path is None:
+        return None
+    modules = local_dependencies(stage) if modules is None else sorted(modules)
+    digest = hashlib.sha256()
+    for name in [stage, *modules]:
+        dependency = _script_path(name)
+        if dependency is None:
+            raise ValueError(f"No module scripts/{name}.py to hash for stage {stage}")
+        digest.update(f"{name}:{file_checksum(dependency)}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+def read_manifest(name, root=None):
+    path = os.path.join(_artifact_dir(name, root), "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(name, manifest, root=None):
+    directory = _artifact_dir(name, root)
+    fd, tmp = tempfile.mkstemp(prefix=".manifest.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    _replace_atomic(tmp, os.path.join(directory, "manifest.json"))
+
+
+def write(name, data, stage, columns=None, codec=None, keep=None, root=None, modules=None):
+    """Write a DataFrame (or an iterable of DataFrame chunks) as a new artifact version.
+
+    `columns` is a list, or a callable taking a chunk, selecting the output
+    columns and their order. `modules` is passed on to stage_version().
+    Returns the manifest entry of the new version.
+    """
+    codec = codec or default_codec()
+    keep = keep or KEEP_VERSIONS
+    directory = _artifact_dir(name, root)
+    os.makedirs(directory, exist_ok=True)
+
+    # Leftovers from a crashed run are never referenced by the manifest
+    for leftover in os.listdir(directory):
+        if leftover.endswith(".tmp"):
+            os.remove(os.path.join(directory, leftover))
+
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    manifest = read_manifest(name, root) or {"name": name, "current": None, "versions": []}
+    version = max([v["version"] for v in manifest["versions"]], default=0) + 1
+    filename = f"{name}.v{version:04d}{EXTENSIONS[codec]}"
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{filename}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    rows, schema = 0, None
+    try:
+        with _open_binary(tmp, "wb", codec) as raw, \
+                io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+            for chunk in chunks:
+                cols = columns(chunk) if callable(columns) else columns or list(chunk.columns)
+                if schema is None:
+                    schema = {col: str(chunk[col].dtype) for col in cols}
+                chunk.to_csv(f, index=False, header=rows == 0, columns=cols)
+                rows += len(chunk)
+        _replace_atomic(tmp, os.path.join(directory, filename))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    path = os.path.join(directory, filename)
+    entry = {
+        "version": version,
+        "file": filename,
+        "codec": codec,
+        "rows": rows,
+        "columns": len(schema or {}),
+        "schema": schema or {},
+        "sha256": file_checksum(path),
+        "bytes": os.path.getsize(path),
+        "stage": stage,
+        "stage_version": stage_version(stage, modules),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    manifest["versions"] = [entry] + manifest["versions"]
+    manifest["current"] = version
+
+    retired = manifest["versions"][keep:]
+    manifest["versions"] = manifest["versions"][:keep]
+    _write_manifest(name, manifest, root)
+    for old in retired:
+        old_path = os.path.join(directory, old["file"])
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    return entry
+
+
+def _entry(name, version=None, root=None):
+    manifest = read_manifest(name, root)
+    if manifest is None:
+        return None
+    wanted = version or manifest["current"]
+    for entry in manifest["versions"]:
+        if entry["version"] == wanted:
+            return entry
+    raise FileNotFoundError(f"{name}: version {wanted} is not retained in the manifest")
+
+
+def verify(name, version=None, root=None):
+    """Raise ValueError if the artifact's bytes no longer match its manifest checksum."""
+    entry = _entry(name, version, root)
+    if entry is None:
+        raise FileNotFoundError(f"No manifest for artifact: {name}")
+    path = os.path.join(_artifact_dir(name, root), entry["file"])
+    if file_checksum(path) != entry["sha256"]:
+        raise ValueError(f"Checksum mismatch for {entry['file']}; re-run stage '{entry['stage']}'")
+    return entry
+
+
+@contextmanager
+def open_artifact(name, version=None, check=True, root=None):
+    """Yield a readable handle (or memory-mappable path) for an artifact.
+
+    Falls back to the legacy data/processed/<name>.csv when the artifact has
+    not been written through the store yet.
+    """
+    entry = _entry(name, version, root)
+    if entry is None:
+        legacy = os.path.join(root or PROCESSED_DIR, f"{name}.csv")
+        if not os.path.exists(legacy):
+            raise FileNotFoundError(f"Artifact not found: {name}")
+        print(f"Note: reading legacy file {name}.csv (no manifest yet)")
+        yield legacy
+        return
+
+    if check:
+        verify(name, entry["version"], root)
+    path = os.path.join(_artifact_dir(name, root), entry["file"])
+    if entry["codec"] == "none":
+        yield path
+        return
+    with _open_binary(path, "rb", entry["codec"]) as f:
+        yield f
+
+
+def read(name, version=None, check=True, root=None, **read_csv_kwargs):
+    """pd.read_csv over the current (or given) version of an artifact.
+
+    Not usable with chunksize=; use iter_chunks() instead.
+    """
+    with open_artifact(name, version, check, root) as source:
+        if isinstance(source, str):
+            read_csv_kwargs.setdefault("memory_map", True)
+        return pd.read_csv(source, **read_csv_kwargs)
+
+
+def iter_chunks(name, chunksize, version=None, check=True, root=None, **read_csv_kwargs):
+    """Yield DataFrame chunks of an artifact, keeping its handle open while iterating."""
+    with open_artifact(name, version, check, root) as source:
+        with pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs) as reader:
+            yield from reader
+
+
+def exists(name, root=None):
+    return read_manifest(name, root) is not None or os.path.exists(
+        os.path.join(root or PROCESSED_DIR, f"{name}.csv"))
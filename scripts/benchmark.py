@@ -0,0 +1,369 @@
+"""Benchmark harness for pipeline stages.
+
+Run from the scripts/ directory once the pipeline has written the processed
+artifacts the benchmark needs, e.g.:
+
+    python benchmark.py features --scale 10 --shards 1 2 4 8
+    python benchmark.py features --scale 10 --max-memory 256M
+    python benchmark.py cube --scale 10
+    python benchmark.py business --scale 10
+    python benchmark.py geo --k 5 --radius 300
+    python benchmark.py text --scale 10
+    python benchmark.py model --scale 10 --threads 1 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import artifact_store
+import memory_budget
+
+
+
+@contextmanager
+def timed(label, rows=None):
+    """Print wall time, throughput and peak RSS for the enclosed block.
+
+    The peak covers only the block where the platform allows resetting it
+    (Linux); elsewhere it is the process-wide peak. Yields a dict whose
+    "seconds" entry is filled in when the block exits.
+    """
+    result = {}
+    memory_budget.reset_peak_rss()
+    start = time.perf_counter()
+    yield result
+    elapsed = result["seconds"] = time.perf_counter() - start
+    line = f"{label}: {elapsed:.2f}s" if elapsed >= 1 else f"{label}: {elapsed * 1000:.1f}ms"
+    if rows:
+        line += f", {rows / elapsed:,.0f} rows/s"
+    rss = memory_budget.peak_rss_bytes()
+    if rss is not None:
+        line += f", peak RSS {memory_budget.format_bytes(rss)}"
+    print(line)
+
+
+def load_clean(name):
+    return artifact_store.read(f"{name}_clean")
+
+
+def scale_frame(df, factor, key_cols):
+    """Replicate df `factor` times, suffixing key columns so copies stay distinct."""
+    if factor <= 1:
+        return df
+    copies = [df]
+    for i in range(1, factor):
+        copy = df.copy()
+        for col in key_cols:
+            if col in copy.columns:
+                copy[col] = copy[col].astype(str) + f"_{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+# =============== Benchmarks ===============
+
+def bench_features(args):
+    import features
+
+    keys = ["order_id", "customer_id", "review_id"]
+    tables = {
+        "orders": scale_frame(load_clean("order"), args.scale, keys),
+        "order_items": scale_frame(load_clean("order_item"), args.scale, keys),
+        "customers": scale_frame(load_clean("customer"), args.scale, keys),
+        "payments": scale_frame(load_clean("order_payment"), args.scale, keys),
+        "reviews": scale_frame(load_clean("order_review"), args.scale, keys),
+        "sellers": load_clean("seller"),
+        "products": features.add_product_features(load_clean("product")),
+        "geo_avg": features.compute_geo_avg(load_clean("geolocation")),
+    }
+    rows = len(tables["orders"])
+    print(f"Feature engineering on {rows:,} orders (scale x{args.scale})")
+
+    serial = features.build_order_features(**tables, verbose=False)
+    serial_csv = serial.to_csv(index=False)
+
+    baseline = None
+    for n_shards in args.shards:
+        with timed(f"  shards={n_shards}", rows) as result:
+            if n_shards > 1:
+                df = features.run_sharded(tables, n_shards)
+            else:
+                df = features.build_order_features(**tables, verbose=False)
+        baseline = baseline or result["seconds"]
+        print(f"    speedup vs first run: {baseline / result['seconds']:.2f}x")
+        if n_shards > 1:
+            if not df.dtypes.equals(serial.dtypes):
+                differing = [col for col in serial.columns if df[col].dtype != serial[col].dtype]
+                raise ValueError(f"Sharded feature dtypes differ from the serial run: {differing}")
+            if df.to_csv(index=False) != serial_csv:
+                raise ValueError("Sharded feature output differs from the serial run")
+            print("    output identical to the serial run")
+
+    if args.max_memory:
+        budget = memory_budget.parse_size(args.max_memory)
+        dims = {name: tables[name] for name in features.BROADCAST_TABLES}
+        rows_per_part = memory_budget.rows_per_chunk(budget, features.ORDER_ROW_BYTES)
+
+        def read_chunks(table):
+            df = tables[table]
+            return (df.iloc[i:i + rows_per_part] for i in range(0, len(df), rows_per_part))
+
+        written = []
+        with timed(f"  spilled, budget {args.max_memory}", rows):
+            with tempfile.TemporaryDirectory() as spill:
+                n_parts = features.spill_order_partitions(read_chunks, rows_per_part, spill)
+                for df in features.iter_spilled_features(spill, n_parts, dims, budget / features.JOIN_EXPANSION):
+                    written.append(df.to_csv(index=False, header=not written))
+        print(f"    {n_parts} partitions of {rows_per_part:,} orders")
+
+        # The artifact store writes each batch as it comes, so compare the CSV text
+        if "".join(written) != serial_csv:
+            raise ValueError("Spilled feature output differs from the serial run")
+        print("    spilled output identical to the serial run")
+
+
+def bench_cube(args):
+    import olap_cube
+
+    df = olap_cube.load_fact_frame()
+    df = pd.concat([df] * args.scale, ignore_index=True) if args.scale > 1 else df
+    print(f"Delivery cube over {len(df):,} rows (scale x{args.scale})")
+
+    with timed("  build cube", len(df)):
+        cube = olap_cube.build_cube(df)
+    print(f"    {len(cube['measures']['orders']):,} cells")
+
+    slices = [
+        (["customer_state"], None),
+        (["category"], {"month": ("2018-01", "2018-06")}),
+        (["seller_state", "payment_type"], {"customer_state": ["SP", "RJ"]}),
+        (["month"], {"payment_type": "boleto"}),
+    ]
+    for by, where in slices:
+        mask = pd.Series(True, index=df.index)
+        for dim, value in (where or {}).items():
+            if isinstance(value, tuple):
+                mask &= (df[dim] >= value[0]) & (df[dim] <= value[1])
+            else:
+                mask &= df[dim].isin([value] if isinstance(value, str) else value)
+        label = ",".join(by) + (f" where {where}" if where else "")
+        with timed(f"  rows  {label}"):
+            df[mask].groupby(by)[["late", "delay_sum", "payment_value", "review_score"]].agg(["sum", "size"])
+        with timed(f"  cube  {label}"):
+            olap_cube.query(cube, by=by, where=where)
+
+
+def _legacy_business_transform(df):
+    """Reference copy of the original row-wise eda_business_needs transform."""
+    for col in ["order_purchase_timestamp", "order_approved_at", "order_delivered_carrier_date",
+                "order_delivered_customer_date", "order_estimated_delivery_date", "shipping_limit_date_x"]:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    df["purchase_year"] = df["order_purchase_timestamp"].dt.year
+    df["purchase_month"] = df["order_purchase_timestamp"].dt.month
+    df["purchase_day"] = df["order_purchase_timestamp"].dt.day
+    df["purchase_dayofweek"] = df["order_purchase_timestamp"].dt.day_name()
+    df["delivery_delay_days"] = (
+        (df["order_delivered_customer_date"] - df["order_estimated_delivery_date"]).dt.days
+    ).fillna(0).clip(lower=0)
+    df["delivery_success"] = df["delivery_delay_days"].apply(lambda x: 1 if x <= 0 else 0)
+    df["revenue"] = df["price"] * df["num_items"]
+    df["total_cost"] = df["revenue"] + df["freight_value"]
+    df["profit_margin_proxy"] = df["price"] * 0.2
+    return df
+
+
+def bench_business(args):
+    import business_features
+
+    model_ready = artifact_store.read("olist_model_ready")
+    scaled = scale_frame(model_ready, args.scale, ["order_id", "customer_id"])
+    rows = len(scaled)
+    print(f"Business-ready transform on {rows:,} rows (scale x{args.scale})")
+
+    with tempfile.TemporaryDirectory(prefix="olist_bench_") as tmp:
+        path = os.path.join(tmp, "olist_model_ready.csv")
+        scaled.to_csv(path, index=False)
+        del scaled, model_ready
+
+        with timed("  legacy read (all columns, then select)", rows) as legacy_read:
+            df = pd.read_csv(path)
+            df = df[[col for col in business_features.BUSINESS_COLS if col in df.columns]]
+        with timed("  legacy transform (row-wise apply)", rows) as legacy:
+            _legacy_business_transform(df)
+        print(f"    memory: {df.memory_usage(deep=True).sum() / 1024 ** 2:,.0f} MB")
+
+        with timed("  pruned read (business columns only)", rows) as pruned_read:
+            df = business_features.read_business_columns(path)
+        with timed("  vectorized transform", rows) as vectorized:
+            business_features.add_business_features(df)
+        print(f"    memory: {df.memory_usage(deep=True).sum() / 1024 ** 2:,.0f} MB")
+
+        with timed("  streamed read + transform", rows):
+            for _ in business_features.iter_business_ready(path, chunksize=args.chunksize):
+                pass
+
+    print(f"    read speedup: {legacy_read['seconds'] / pruned_read['seconds']:.2f}x, "
+          f"transform speedup: {legacy['seconds'] / vectorized['seconds']:.2f}x")
+
+
+def _brute_knn(points_lat, points_lng, lat, lng, k, batch=1024):
+    """Reference k-nearest: full pairwise haversine distances, one query batch at a time."""
+    import geo_index
+
+    dist, idx = [], []
+    for start in range(0, len(lat), batch):
+        d = geo_index.haversine_km(lat[start:start + batch, None], lng[start:start + batch, None],
+                                   points_lat, points_lng)
+        order = np.argsort(d, axis=1)[:, :k]
+        dist.append(np.take_along_axis(d, order, axis=1))
+        idx.append(order)
+    return np.concatenate(dist), np.concatenate(idx)
+
+
+def _brute_radius(points_lat, points_lng, lat, lng, radius_km, batch=1024):
+    """Reference radius query: (query, point) pairs and per-query counts from full pairwise distances."""
+    import geo_index
+
+    pairs, counts = [], []
+    for start in range(0, len(lat), batch):
+        d = geo_index.haversine_km(lat[start:start + batch, None], lng[start:start + batch, None],
+                                   points_lat, points_lng)
+        within = d <= radius_km
+        q, p = np.nonzero(within)
+        pairs.append((q + start, p, d[q, p]))
+        counts.append(within.sum(axis=1))
+    return pairs, np.concatenate(counts)
+
+
+def bench_geo(args):
+    import geo_index
+
+    geo_avg = geo_index.load_zip_centroids()
+    sellers = geo_index.load_seller_locations(geo_avg=geo_avg)
+    points_lat, points_lng = sellers["seller_lat"].to_numpy(), sellers["seller_lng"].to_numpy()
+    lat = np.tile(geo_avg["geolocation_lat"].to_numpy(), args.scale)
+    lng = np.tile(geo_avg["geolocation_lng"].to_numpy(), args.scale)
+    print(f"{len(lat):,} zip centroids against {len(sellers):,} sellers (scale x{args.scale})")
+
+    with timed(f"  brute force {args.k}-nearest", len(lat)) as brute:
+        expected, _ = _brute_knn(points_lat, points_lng, lat, lng, args.k)
+    with timed(f"  brute force within {args.radius:g} km", len(lat)) as brute_radius:
+        _, expected_counts = _brute_radius(points_lat, points_lng, lat, lng, args.radius)
+    expected_pairs = int(expected_counts.sum())
+
+    backends = ["grid"] + (["balltree"] if geo_index._sklearn_balltree() else [])
+    for backend in backends:
+        with timed(f"  {backend} build"):
+            index = geo_index.GeoIndex(points_lat, points_lng, backend=backend)
+        with timed(f"  {backend} {args.k}-nearest", len(lat)) as knn:
+            dist, _ = index.query_knn(lat, lng, k=args.k)
+        with timed(f"  {backend} within {args.radius:g} km", len(lat)) as radius:
+            query_idx, _, _ = index.query_radius(lat, lng, args.radius, sort_results=False)
+        with timed(f"  {backend} count within {args.radius:g} km", len(lat)):
+            counts = index.count_within(lat, lng, args.radius)
+        if (not np.allclose(dist, expected) or len(query_idx) != expected_pairs
+                or not np.array_equal(counts, expected_counts)):
+            raise ValueError(f"{backend} results differ from brute force")
+        print(f"    speedup: {brute['seconds'] / knn['seconds']:.2f}x k-nearest, "
+              f"{brute_radius['seconds'] / radius['seconds']:.2f}x radius ({expected_pairs:,} pairs)")
+
+
+def bench_text(args):
+    import review_text
+
+    reviews = scale_frame(load_clean("order_review"), args.scale, ["order_id", "review_id"])
+    reviews = reviews[["order_id", *review_text.TEXT_COLS]]
+    rows = len(reviews)
+    print(f"Review text on {rows:,} reviews (scale x{args.scale}, batches of {args.batch:,})")
+
+    batches = [reviews.iloc[i:i + args.batch] for i in range(0, rows, args.batch)]
+    with timed("  fingerprint (warm run: all orders cached)", rows):
+        for batch in batches:
+            review_text.fingerprints(batch)
+    with timed("  normalize + tokenize + hash (cold run)", rows):
+        nnz = sum(len(review_text.vectorize(batch)["data"]) for batch in batches)
+    print(f"    {nnz:,} non-zero hashed term counts")
+
+
+def bench_model(args):
+    import delivery_model
+
+    df = artifact_store.read("final_ml_ready")
+    df = scale_frame(df, args.scale, ["order_id", "customer_id"])
+    rows = len(df)
+    print(f"Delivery model on {rows:,} orders (scale x{args.scale})")
+
+    with timed("  float32 feature matrix", rows):
+        spec = delivery_model.feature_spec(df)
+        X = delivery_model.to_matrix(df, spec)
+    y = df[delivery_model.TARGET].to_numpy()
+    print(f"    {X.shape[1]} features, {memory_budget.format_bytes(X.nbytes)}, "
+          f"C-contiguous: {X.flags['C_CONTIGUOUS']}")
+
+    params = {"early_stopping": False, "max_iter": args.iterations}
+    baseline = None
+    for threads in args.threads:
+        with timed(f"  train threads={threads}", rows) as result:
+            model = delivery_model.train(X, y, spec, threads=threads, params=params)
+        baseline = baseline or result["seconds"]
+        print(f"    speedup vs first run: {baseline / result['seconds']:.2f}x")
+
+    chunks = [df.iloc[i:i + args.batch] for i in range(0, rows, args.batch)]
+    with timed(f"  score in batches of {args.batch:,}", rows):
+        for _ in delivery_model.score_chunks(model, chunks):
+            pass
+
+
+BENCHMARKS = {
+    "features": bench_features,
+    "cube": bench_cube,
+    "business": bench_business,
+    "geo": bench_geo,
+    "text": bench_text,
+    "model": bench_model,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages.")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    features_parser = sub.add_parser("features", help="Serial vs sharded feature engineering")
+    features_parser.add_argument("--scale", type=int, default=1, help="Replicate order tables N times")
+    features_parser.add_argument("--shards", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    features_parser.add_argument("--max-memory", metavar="SIZE",
+                                 help="Also time the spilled, partitioned path under this budget")
+
+    cube_parser = sub.add_parser("cube", help="Row-level group-bys vs cube roll-ups")
+    cube_parser.add_argument("--scale", type=int, default=1, help="Replicate business rows N times")
+
+    business_parser = sub.add_parser("business", help="Row-wise vs vectorized business-ready transform")
+    business_parser.add_argument("--scale", type=int, default=10, help="Replicate model-ready rows N times")
+    business_parser.add_argument("--chunksize", type=int, default=250_000)
+
+    text_parser = sub.add_parser("text", help="Review text vectorization vs cached fingerprint check")
+    text_parser.add_argument("--scale", type=int, default=1, help="Replicate reviews N times")
+    text_parser.add_argument("--batch", type=int, default=50_000, help="Reviews per batch")
+
+    model_parser = sub.add_parser("model", help="Delivery model training and batch scoring")
+    model_parser.add_argument("--scale", type=int, default=1, help="Replicate ML-ready rows N times")
+    model_parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    model_parser.add_argument("--iterations", type=int, default=100, help="Boosting iterations (no early stopping)")
+    model_parser.add_argument("--batch", type=int, default=100_000, help="Orders per scoring batch")
+
+    geo_parser = sub.add_parser("geo", help="Spatial index vs brute-force distances")
+    geo_parser.add_argument("--scale", type=int, default=1, help="Replicate zip-centroid queries N times")
+    geo_parser.add_argument("--k", type=int, default=5)
+    geo_parser.add_argument("--radius", type=float, default=300, help="Radius query in km")
+
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+import olap_cube
+
+print("\nLoading business-ready dataset for cube build...")
+df = olap_cube.load_fact_frame()
+print(f"Loaded {len(df)} rows.")
+
+print("\nAggregating measures over customer state, seller state, category, month and payment type...")
+cube = olap_cube.build_cube(df)
+print(f"Cube cells: {len(cube['measures']['orders'])}")
+
+olap_cube.save_cube(cube)
+size_kb = os.path.getsize(olap_cube.CUBE_PATH) / 1024
+print(f"Cube saved to: {olap_cube.CUBE_PATH} ({size_kb:.1f} KB)")
+
+print("\nSample roll-up (late rate by customer state):")
+print(olap_cube.query(cube, by=["customer_state"])
+      .sort_values("late_rate", ascending=False)[["customer_state", "orders", "late_rate"]]
+      .head(5)
+      .to_string(index=False))
+print()
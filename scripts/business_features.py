@@ -0,0 +1,86 @@
+"""Column-pruned, vectorized transform behind eda_business_needs.py.
+
+Only BUSINESS_COLS are read from olist_model_ready.csv and every derived
+column is computed with whole-column NumPy/pandas operations on the loaded
+frame (no row-wise apply, no full-width copies). iter_business_ready() yields
+the result chunk by chunk so callers can stream it to disk or into another
+stage without holding the full dataset.
+"""
+import numpy as np
+import pandas as pd
+
+BUSINESS_COLS = [
+    "order_id", "customer_id", "customer_unique_id",
+    "order_purchase_timestamp", "order_approved_at",
+    "order_delivered_carrier_date", "order_delivered_customer_date",
+    "order_estimated_delivery_date", "shipping_limit_date_x",
+    "customer_city", "customer_state",
+    "seller_id", "seller_city", "seller_state",
+    "customer_seller_distance_km", "log_distance_seller_customer",
+    "product_id", "product_category_name",
+    "price", "freight_value", "num_items", "total_price",
+    "payment_value", "payment_installments",
+    "review_score", "has_review",
+    "delivery_time_days", "approval_delay_days",
+    "promised_delivery_days", "shipping_window_days",
+    "is_delivered", "is_late", "delivered_late"
+]
+
+DATE_COLS = [
+    "order_purchase_timestamp", "order_approved_at",
+    "order_delivered_carrier_date", "order_delivered_customer_date",
+    "order_estimated_delivery_date", "shipping_limit_date_x"
+]
+
+DERIVED_COLS = [
+    "purchase_year", "purchase_month", "purchase_day", "purchase_dayofweek",
+    "delivery_delay_days", "delivery_success",
+    "revenue", "total_cost", "profit_margin_proxy"
+]
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def read_business_columns(path, chunksize=None):
+    """Read only BUSINESS_COLS; returns a DataFrame, or an iterator when chunksize is set."""
+    wanted = set(BUSINESS_COLS)
+    return pd.read_csv(path, usecols=lambda col: col in wanted, chunksize=chunksize)
+
+
+def output_columns(df):
+    """BUSINESS_COLS present in df, in their canonical order, followed by DERIVED_COLS."""
+    return [col for col in BUSINESS_COLS if col in df.columns] + [col for col in DERIVED_COLS if col in df.columns]
+
+
+def add_business_features(df):
+    """Add DERIVED_COLS to df in place and return it."""
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+
+    purchase = df["order_purchase_timestamp"].dt
+    # Nullable small ints keep the same CSV text in every chunk, with or without NaT
+    df["purchase_year"] = purchase.year.astype("Int16")
+    df["purchase_month"] = purchase.month.astype("Int8")
+    df["purchase_day"] = purchase.day.astype("Int8")
+    # Weekday as int8 codes behind a categorical of day names instead of one string per row
+    weekday = purchase.dayofweek.fillna(-1).to_numpy(dtype=np.int8)
+    df["purchase_dayofweek"] = pd.Categorical.from_codes(weekday, categories=DAY_NAMES)
+
+    if "order_delivered_customer_date" in df.columns and "order_estimated_delivery_date" in df.columns:
+        delay = (df["order_delivered_customer_date"] - df["order_estimated_delivery_date"]).dt.days
+        df["delivery_delay_days"] = np.maximum(delay.fillna(0).to_numpy(dtype=float), 0.0)
+
+    df["delivery_success"] = np.where(df["delivery_delay_days"].to_numpy() <= 0, 1, 0).astype(np.int8)
+
+    price = df["price"].to_numpy()
+    df["revenue"] = price * df["num_items"].to_numpy()
+    df["total_cost"] = df["revenue"].to_numpy() + df["freight_value"].to_numpy()
+    df["profit_margin_proxy"] = price * 0.2  # assume 20% margin
+    return df
+
+
+def iter_business_ready(path, chunksize=250_000):
+    """Yield business-ready chunks of the model-ready CSV at `path`."""
+    for chunk in read_business_columns(path, chunksize=chunksize):
+        yield add_business_features(chunk)
@@ -0,0 +1,154 @@
+"""Chart aggregates for the web dashboard.
+
+The export stage (dashboard_export.py) builds small pre-aggregated chart facets
+from the rows returned by olap_cube.load_fact_frame() and the optional server
+(dashboard_server.py) answers filtered queries from those facets. Both turn
+facet rows into the chart specs rendered by web_dashboard/script.js, so neither
+touches row-level data at query time.
+
+The facets only hold what the charts need (orders, late count, delay days by
+month, customer state and one chart dimension such as review_score). For
+general roll-ups over the delivery data use olap_cube.query() instead.
+"""
+import gzip
+import json
+import os
+
+import pandas as pd
+
+DASHBOARD_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "web_dashboard", "data")
+
+# Every facet is keyed by purchase month and customer state so the server can
+# filter on both; the extra dimension is what the facet's charts group by.
+FILTER_DIMS = ["month", "customer_state"]
+FACETS = {
+    "overall": [],
+    "review_score": ["review_score"],
+    "category": ["category"],
+    "seller_state": ["seller_state"],
+    "payment_type": ["payment_type"],
+}
+FACET_MEASURES = ["orders", "late", "delay_sum"]
+
+
+def build_chart_facets(df):
+    """Aggregate rows from olap_cube.load_fact_frame() into one frame per facet."""
+    facets = {}
+    for facet, dims in FACETS.items():
+        keys = FILTER_DIMS + dims
+        facets[facet] = (
+            df.groupby(keys, sort=True)
+            .agg(orders=("late", "size"), late=("late", "sum"), delay_sum=("delay_sum", "sum"))
+            .reset_index()
+        )
+    return facets
+
+
+def facets_to_json(facets):
+    return {facet: frame.to_dict(orient="list") for facet, frame in facets.items()}
+
+
+def facets_from_json(data):
+    return {facet: pd.DataFrame(columns) for facet, columns in data.items()}
+
+
+def filter_options(facets):
+    overall = facets["overall"]
+    months = sorted(m for m in overall["month"].unique() if m != "unknown")
+    return {"months": months, "states": sorted(overall["customer_state"].unique())}
+
+
+def _filtered(frame, start=None, end=None, state=None):
+    mask = pd.Series(True, index=frame.index)
+    if start:
+        mask &= (frame["month"] >= start) & (frame["month"] != "unknown")
+    if end:
+        mask &= (frame["month"] <= end) & (frame["month"] != "unknown")
+    if state:
+        mask &= frame["customer_state"] == state
+    return frame[mask]
+
+
+def _rollup(frame, dim):
+    return frame.groupby(dim)[FACET_MEASURES].sum()
+
+
+def _chart(kind, title, series, x_label, y_label, value_format="number"):
+    return {
+        "type": kind,
+        "title": title,
+        "labels": [str(label) for label in series.index],
+        "values": [round(float(v), 4) for v in series.values],
+        "x_label": x_label,
+        "y_label": y_label,
+        "format": value_format,
+    }
+
+
+def build_charts(facets, start=None, end=None, state=None):
+    """Chart specs keyed by the dashboard's data-plot names.
+
+    start/end are inclusive "YYYY-MM" months and state is a customer state;
+    any of them may be None to skip that filter.
+    """
+    facet = {name: _filtered(frame, start, end, state) for name, frame in facets.items()}
+    overall = facet["overall"]
+    orders = overall["orders"].sum()
+    # With no matching orders the chart is left empty rather than showing 100% on time
+    late_pct = 100 * overall["late"].sum() / orders if orders else None
+    late_split = (pd.Series([100 - late_pct, late_pct], index=["On-Time", "Late"])
+                  if orders else pd.Series([], dtype=float))
+
+    reviews = facet["review_score"].groupby("review_score")["orders"].sum().sort_index()
+    categories = _rollup(facet["category"], "category")
+    by_state = _rollup(overall, "customer_state")
+    by_seller = _rollup(facet["seller_state"], "seller_state")
+    by_payment = _rollup(facet["payment_type"], "payment_type")
+    by_month = _rollup(overall[overall["month"] != "unknown"], "month").sort_index()
+
+    return {
+        "late_rate": _chart(
+            "bar", "Delivery Performance (On-Time vs Late)",
+            late_split,
+            "", "Percentage (%)", "percent"),
+        "review_distribution": _chart(
+            "bar", "Review Score Distribution",
+            reviews / reviews.sum() if reviews.sum() else reviews,
+            "Review Score", "Proportion", "ratio"),
+        "top_categories": _chart(
+            "hbar", "Top 5 Product Categories",
+            categories["orders"].sort_values(ascending=False).head(5),
+            "Number of Orders", "Category"),
+        "eda_delay_by_seller": _chart(
+            "hbar", "Average Delivery Delay by Seller State",
+            (by_seller["delay_sum"] / by_seller["orders"]).sort_values(ascending=False),
+            "Avg Delay (Days)", "Seller State"),
+        "eda_delay_by_state": _chart(
+            "hbar", "Average Delivery Delay by Customer State",
+            (by_state["delay_sum"] / by_state["orders"]).sort_values(ascending=False),
+            "Avg Delay (Days)", "Customer State"),
+        "eda_late_by_category": _chart(
+            "hbar", "Late Delivery Rate by Product Category (Top 15)",
+            (categories["late"] / categories["orders"]).sort_values(ascending=False).head(15),
+            "Late Delivery Rate", "Product Category", "ratio"),
+        "eda_late_by_payment": _chart(
+            "bar", "Late Delivery Rate by Payment Type",
+            (by_payment["late"] / by_payment["orders"]).sort_values(),
+            "Payment Type", "Late Delivery Rate", "ratio"),
+        "eda_monthly_trend": _chart(
+            "line", "Monthly Trend of Late Deliveries",
+            by_month["late"] / by_month["orders"],
+            "Month", "Late Delivery Rate", "ratio"),
+    }
+
+
+def write_json_gz(obj, path):
+    """Write obj as compact gzip-compressed JSON (mtime=0 keeps output reproducible)."""
+    payload = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(payload)
+
+
+def read_json_gz(path):
+    with gzip.open(path, "rb") as f:
+        return json.loads(f.read().decode("utf-8"))
@@ -0,0 +1,29 @@
+import os
+import dashboard_data
+import olap_cube
+
+OUTPUT_DIR = dashboard_data.DASHBOARD_DATA_DIR
+
+print("\nLoading business-ready dataset for dashboard export...")
+df = olap_cube.load_fact_frame()
+print(f"Loaded {len(df)} rows.")
+
+print("\nBuilding pre-aggregated chart facets...")
+facets = dashboard_data.build_chart_facets(df)
+for facet, frame in facets.items():
+    print(f"{facet}: {len(frame)} cells")
+
+print("\nWriting compressed chart aggregates...")
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+charts = dashboard_data.build_charts(facets)
+for name, chart in charts.items():
+    dashboard_data.write_json_gz(chart, os.path.join(OUTPUT_DIR, f"{name}.json.gz"))
+    print(f"Saved: {name}.json.gz")
+
+dashboard_data.write_json_gz(dashboard_data.facets_to_json(facets), os.path.join(OUTPUT_DIR, "facets.json.gz"))
+print("Saved: facets.json.gz")
+
+total_kb = sum(
+    os.path.getsize(os.path.join(OUTPUT_DIR, f)) for f in os.listdir(OUTPUT_DIR) if f.endswith(".json.gz")
+) / 1024
+print(f"\nDashboard data exported to: {OUTPUT_DIR} ({total_kb:.1f} KB)\n")
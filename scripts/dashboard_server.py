@@ -0,0 +1,77 @@
+"""Optional local server for the web dashboard.
+
+Serves web_dashboard/ as static files and answers filtered chart queries from
+the chart facets written by dashboard_export.py:
+
+    GET /api/filters                                   -> available months and states
+    GET /api/charts?start=2017-01&end=2017-12&state=SP -> chart specs for that slice
+
+Usage (from scripts/, after dashboard_export.py):
+    python dashboard_server.py --port 8000
+"""
+import argparse
+import gzip
+import json
+import os
+from functools import partial, lru_cache
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import dashboard_data
+
+DASHBOARD_DIR = os.path.join(os.path.dirname(__file__), "..", "web_dashboard")
+
+
+class DashboardHandler(SimpleHTTPRequestHandler):
+    facets = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/api/filters":
+            return self.send_json(dashboard_data.filter_options(self.facets))
+        if url.path == "/api/charts":
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            return self.send_json(self.charts(params.get("start"), params.get("end"), params.get("state")))
+        return super().do_GET()
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def charts(cls, start, end, state):
+        return dashboard_data.build_charts(cls.facets, start, end, state)
+
+    def send_json(self, obj):
+        body = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard with filtered chart queries.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    facets_path = os.path.join(dashboard_data.DASHBOARD_DATA_DIR, "facets.json.gz")
+    if not os.path.exists(facets_path):
+        raise SystemExit(f"Chart facets not found at {facets_path}. Run dashboard_export.py first.")
+
+    print("Loading dashboard chart facets...")
+    DashboardHandler.facets = dashboard_data.facets_from_json(dashboard_data.read_json_gz(facets_path))
+
+    handler = partial(DashboardHandler, directory=DASHBOARD_DIR)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Serving dashboard at http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
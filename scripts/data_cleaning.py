@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import os
+import artifact_store
 
 def load_raw_data():
     print("\nLoading raw CSV files from disk...")
@@ -69,15 +70,10 @@ def remove_duplicates(dfs):
     return dfs
 
 def save_cleaned_files(dfs):
-    print("\nSaving cleaned dataframes to processed directory...")
-    processed_path = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
-    
-    # Create the processed directory if it doesn't exist
-    os.makedirs(processed_path, exist_ok=True)
-
+    print("\nSaving cleaned dataframes to the processed artifact store...")
     for name, df in dfs.items():
-        df.to_csv(os.path.join(processed_path, f"{name}_clean.csv"), index=False)
-        print(f"Saved: {name}_clean.csv")
+        entry = artifact_store.write(f"{name}_clean", df, stage="data_cleaning")
+        print(f"Saved: {entry['file']} ({entry['rows']} rows, {entry['bytes'] / 1024:.0f} KB)")
 
 
 # pipeline
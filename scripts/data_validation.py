@@ -1,9 +1,7 @@
-import os
-import pandas as pd
+import artifact_store
 
 def load_processed_data():
-    print("\nLoading cleaned CSV files from processed directory...")
-    base_path = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+    print("\nLoading cleaned artifacts (checksums verified)...")
     files = [
         "order_clean.csv",
         "customer_clean.csv",
@@ -18,10 +16,10 @@ def load_processed_data():
 
     dfs = {}
     for file in files:
-        path = os.path.join(base_path, file)
-        if os.path.exists(path):
+        artifact = file.replace(".csv", "")
+        if artifact_store.exists(artifact):
             name = file.replace("_clean.csv", "")
-            dfs[name] = pd.read_csv(path)
+            dfs[name] = artifact_store.read(artifact)
             print(f"Loaded: {file}")
         else:
             print(f"Missing processed file: {file}")
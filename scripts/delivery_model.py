@@ -0,0 +1,220 @@
+"""Late-delivery model: float32 feature matrices, histogram gradient boosting, batch scoring.
+
+    spec = feature_spec(df)                       # columns and category vocabularies
+    X = to_matrix(df, spec)                       # C-contiguous float32, NaN for missing
+    model = train(X, y, spec, threads=4)
+    save_model(model)
+    for scores in score_chunks(load_model(), chunks):
+        ...
+
+Training needs scikit-learn (`pip install scikit-learn`). The model is
+persisted with its feature spec, so scoring rebuilds exactly the matrix
+layout used in training.
+"""
+import os
+import pickle
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import artifact_store
+
+TARGET = "delivered_late"
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "delivery_model.pkl")
+
+# Identifiers and zip codes: unique per row or too fine-grained to generalize
+ID_COLS = [
+    "order_id", "customer_id", "customer_unique_id", "product_id", "seller_id",
+    "customer_zip_code_prefix", "seller_zip_code_prefix",
+    "geolocation_zip_code_prefix_x", "geolocation_zip_code_prefix_y",
+]
+
+# Only known once the order has been delivered (or reviewed); using them would
+# leak the target into training and they are missing for orders in flight
+POST_DELIVERY_COLS = [
+    "is_late", "is_delivered", "delivery_time_days", "order_status",
+    "review_score", "has_review", "review_token_count", "review_delivery_terms",
+]
+
+CATEGORICAL_COLS = ["customer_state", "seller_state", "product_category_name"]
+
+# HistGradientBoosting bins categories into at most 255 bins (one is kept for missing)
+MAX_CATEGORIES = 254
+
+DEFAULT_PARAMS = {"max_iter": 300, "learning_rate": 0.1, "max_leaf_nodes": 31, "early_stopping": True,
+                  "validation_fraction": 0.1, "n_iter_no_change": 20, "random_state": 42}
+
+
+def load_purchase_times(root=None):
+    """order_id -> purchase timestamp; final_ml_ready drops the raw timestamps."""
+    orders = artifact_store.read("order_clean", root=root, usecols=["order_id", "order_purchase_timestamp"])
+    return pd.Series(pd.to_datetime(orders["order_purchase_timestamp"], errors="coerce").to_numpy(),
+                     index=orders["order_id"].to_numpy()).groupby(level=0).first()
+
+
+def _is_boolean(series):
+    """Bool column, or an object column of True/False that NaN (e.g. an unmatched join) kept from being bool."""
+    if pd.api.types.is_bool_dtype(series):
+        return True
+    if series.dtype != object:
+        return False
+    values = series.dropna()
+    return len(values) > 0 and values.map(lambda value: isinstance(value, (bool, np.bool_))).all()
+
+
+def _as_float32(series):
+    """Numeric or boolean column as float32, with True/False as 1.0/0.0 and anything else missing as NaN."""
+    if series.dtype == object:
+        series = series.map({True: 1.0, False: 0.0})
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def feature_spec(df, post_delivery=False):
+    """Feature layout learned from a training frame.
+
+    Numeric columns are every remaining numeric/boolean column; categorical
+    columns keep their MAX_CATEGORIES most frequent values as a vocabulary.
+    Other columns (free text, cities) are listed under "skipped".
+    """
+    excluded = set(ID_COLS) | {TARGET} | (set() if post_delivery else set(POST_DELIVERY_COLS))
+    categorical = {}
+    for col in CATEGORICAL_COLS:
+        if col in df.columns and col not in excluded:
+            categorical[col] = df[col].dropna().astype(str).value_counts().index[:MAX_CATEGORIES].tolist()
+    numeric, skipped = [], []
+    for col in df.columns:
+        if col in excluded or col in categorical:
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]) or _is_boolean(df[col]):
+            numeric.append(col)
+        else:
+            skipped.append(col)
+    return {"numeric": numeric, "categorical": categorical, "skipped": skipped}
+
+
+def feature_names(spec):
+    return spec["numeric"] + list(spec["categorical"])
+
+
+def to_matrix(df, spec):
+    """C-contiguous float32 matrix in the spec's column order.
+
+    Missing values and unseen categories become NaN; booleans become 1.0/0.0
+    and categories are encoded as their vocabulary position.
+    """
+    missing = [col for col in feature_names(spec) if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing model feature columns: {missing}")
+    X = np.empty((len(df), len(feature_names(spec))), dtype=np.float32)
+    for j, col in enumerate(spec["numeric"]):
+        X[:, j] = _as_float32(df[col])
+    offset = len(spec["numeric"])
+    for j, (col, vocabulary) in enumerate(spec["categorical"].items()):
+        codes = pd.Categorical(df[col].astype("string"), categories=vocabulary).codes
+        X[:, offset + j] = np.where(codes < 0, np.nan, codes).astype(np.float32)
+    return X
+
+
+def time_split(times, test_start=None, test_fraction=0.2):
+    """Boolean train/test masks splitting on purchase time.
+
+    Orders on or after `test_start` (default: the time that leaves the last
+    `test_fraction` of orders for testing) form the test set. Orders
+    without a purchase time are in neither set.
+    """
+    times = pd.to_datetime(pd.Series(times), errors="coerce")
+    known = times.notna().to_numpy()
+    if not known.any():
+        raise ValueError("No purchase timestamps available for a time-based split")
+    cutoff = pd.Timestamp(test_start) if test_start else times[known].quantile(1 - test_fraction)
+    test = known & (times >= cutoff).to_numpy()
+    train = known & ~test
+    if not train.any() or not test.any():
+        raise ValueError(f"Time split at {cutoff} leaves an empty train or test set")
+    return train, test, cutoff
+
+
+def _thread_limit(threads):
+    """Context manager capping the OpenMP threads scikit-learn uses (no-op when threads is None)."""
+    if not threads:
+        return nullcontext()
+    from threadpoolctl import threadpool_limits
+    return threadpool_limits(limits=threads, user_api="openmp")
+
+
+def train(X, y, spec, threads=None, params=None):
+    """Fit a HistGradientBoostingClassifier; returns the model bundle to persist."""
+    try:
+        from sklearn.ensemble import HistGradientBoostingClassifier
+    except ImportError:
+        raise ValueError("Model training needs scikit-learn (pip install scikit-learn)") from None
+
+    n_numeric = len(spec["numeric"])
+    categorical_mask = np.arange(X.shape[1]) >= n_numeric
+    estimator = HistGradientBoostingClassifier(
+        categorical_features=categorical_mask if categorical_mask.any() else None,
+        **{**DEFAULT_PARAMS, **(params or {})}
+    )
+    start = time.perf_counter()
+    with _thread_limit(threads):
+        estimator.fit(X, np.asarray(y, dtype=np.int8))
+    return {
+        "estimator": estimator,
+        "spec": spec,
+        "threads": threads,
+        "train_rows": len(X),
+        "train_seconds": time.perf_counter() - start,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def predict_proba(model, X, threads=None):
+    with _thread_limit(threads or model.get("threads")):
+        return model["estimator"].predict_proba(X)[:, 1].astype(np.float32)
+
+
+def evaluate(model, X, y, threshold=0.5):
+    """Test-set metrics: ROC AUC, log loss, accuracy and the late base rate."""
+    from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+
+    y = np.asarray(y, dtype=np.int8)
+    proba = predict_proba(model, X)
+    metrics = {
+        "rows": len(y),
+        "late_rate": float(y.mean()),
+        "accuracy": float(accuracy_score(y, proba >= threshold)),
+        "log_loss": float(log_loss(y, proba, labels=[0, 1])),
+    }
+    metrics["roc_auc"] = float(roc_auc_score(y, proba)) if len(np.unique(y)) == 2 else None
+    return metrics
+
+
+def score_chunks(model, chunks, threads=None):
+    """Yield an order_id / late_probability frame for each DataFrame chunk."""
+    for chunk in chunks:
+        yield pd.DataFrame({
+            "order_id": chunk["order_id"].to_numpy(),
+            "late_probability": predict_proba(model, to_matrix(chunk, model["spec"]), threads),
+        })
+
+
+def save_model(model, path=MODEL_PATH):
+    """Pickle the model bundle, replacing any previous model only once the write is complete."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".delivery_model.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_model(path=MODEL_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No trained model at {path}; run train_model.py first")
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -2,9 +2,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import artifact_store
 
-# Define input and output paths
-INPUT_FILE = "../data/processed/eda_business_ready.csv"
+# Define output path
 OUTPUT_DIR = "../reports/business/"
 
 print("Setting up output directory...")
@@ -14,18 +14,27 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 sns.set_style("whitegrid")
 plt.rcParams["figure.figsize"] = (10, 6)
 
+# Only the columns the plots use are read; intermediates are released once merged
+PLOT_COLS = {
+    "order_id", "customer_id", "product_category_name", "delivered_late",
+    "delivery_delay_days", "customer_state", "seller_state", "payment_value",
+    "order_purchase_timestamp"
+}
+
 print("Loading datasets...")
-df = pd.read_csv(INPUT_FILE)
-translation = pd.read_csv("../data/processed/translation_clean.csv")
-payments = pd.read_csv("../data/processed/order_payment_clean.csv")
+df = artifact_store.read("eda_business_ready", usecols=lambda col: col in PLOT_COLS)
+translation = artifact_store.read("translation_clean")
+payments = artifact_store.read("order_payment_clean", usecols=["order_id", "payment_sequential", "payment_type"])
 print("Datasets loaded successfully.")
 
 print("Merging product category translations...")
 df = df.merge(translation, how="left", on="product_category_name")
+del translation
 
 print("Merging primary payment type per order...")
 payments_primary = payments.sort_values("payment_sequential").drop_duplicates("order_id")
 df = df.merge(payments_primary[["order_id", "payment_type"]], how="left", on="order_id")
+del payments, payments_primary
 
 print("Parsing purchase timestamps...")
 if "order_purchase_timestamp" in df.columns:
@@ -1,9 +1,9 @@
-import pandas as pd
+import artifact_store
 
 def eda_summary(df):
     insights = {}
     print("\nReading product category translation file...")
-    tr_df = pd.read_csv("../data/processed/translation_clean.csv")
+    tr_df = artifact_store.read("translation_clean")
 
     print("\nAnalyzing dataset shape...")
     insights["shape"] = df.shape
@@ -46,7 +46,7 @@ def eda_summary(df):
     return insights
 
 print("\nLoading final ML-ready dataset...")
-final_df = pd.read_csv("../data/processed/final_ml_ready.csv")
+final_df = artifact_store.read("final_ml_ready")
 
 print("\nGenerating EDA insights from dataset...")
 insights = eda_summary(final_df)
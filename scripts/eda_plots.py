@@ -1,10 +1,9 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import artifact_store
 
 # Paths
-DATA_PATH = os.path.join("..", "data", "processed", "final_ml_ready.csv")
 FIG_PATH = os.path.join("..", "reports", "basic_plots")
 
 os.makedirs(FIG_PATH, exist_ok=True)
@@ -50,13 +49,11 @@ def plot_review_distribution(df):
 def plot_top_categories(df, n=10):
     print("\nPlotting top product categories...")
     top_categories = df["product_category_name"].value_counts().head(5).to_dict()
-    translation_path = "../data/processed/translation_clean.csv"
-
-    if not os.path.exists(translation_path):
-        print(f"Translation file not found at: {translation_path}")
+    if not artifact_store.exists("translation_clean"):
+        print("Translation artifact not found: translation_clean")
         return
 
-    tr_df = pd.read_csv(translation_path)
+    tr_df = artifact_store.read("translation_clean")
     translation_dict = dict(zip(
         tr_df["product_category_name"],
         tr_df["product_category_name_english"]
@@ -131,7 +128,7 @@ def plot_delay_correlations(df):
     print("Saved: delay_correlations.png")
 
 print("\nStarting EDA Plot Generation...")
-df = pd.read_csv(DATA_PATH)
+df = artifact_store.read("final_ml_ready")
 
 plot_late_rate(df)
 plot_review_distribution(df)
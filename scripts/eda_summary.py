@@ -1,9 +1,9 @@
-import pandas as pd
+import artifact_store
 
 def print_summary():
     # Load dataset
     print("\nLoading cleaned dataset...")
-    df = pd.read_csv("../data/processed/final_ml_ready.csv")
+    df = artifact_store.read("final_ml_ready")
 
     print("\n==== EDA SUMMARY ====\n")
 
@@ -0,0 +1,416 @@
+"""Order-level feature transforms used by feature_engineering.py.
+
+Nothing here runs at import time, so worker processes can import this module
+safely under any multiprocessing start method (fork, spawn or forkserver).
+"""
+import glob
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+import pandas as pd
+
+# Dimension tables broadcast to every shard instead of being partitioned
+BROADCAST_TABLES = ["products", "sellers", "geo_avg"]
+
+# Fact tables hash-partitioned by order_id (customers follow their orders)
+SHARDED_TABLES = ["orders", "order_items", "customers", "payments", "reviews"]
+
+# Integer columns that a left join (or an unparsable date) can leave missing.
+# Plain pandas makes them int64 or float64 depending on whether the rows at hand
+# have a gap, so they use the nullable Int64 dtype instead: every shard or
+# spilled batch then writes "1" (or an empty field) exactly like a single run.
+NULLABLE_INT_COLS = [
+    "shipping_window_days", "promised_delivery_days", "approval_delay_days",
+    "customer_zip_code_prefix", "geolocation_zip_code_prefix_x",
+    "seller_zip_code_prefix", "geolocation_zip_code_prefix_y",
+    "order_item_id", "is_category_missing", "payment_installments",
+    "has_review", "num_items",
+]
+
+
+GEO_COLS = ["geolocation_zip_code_prefix", "geolocation_lat", "geolocation_lng"]
+
+# Geolocation rows summed per chunk. Fixed rather than taken from the memory
+# budget: the chunking decides how the float sums round, and every run has to
+# produce the same zip averages.
+GEO_CHUNK_ROWS = 50_000
+
+
+def compute_geo_avg(geolocation):
+    return geo_avg_from_chunks(
+        geolocation.iloc[i:i + GEO_CHUNK_ROWS] for i in range(0, len(geolocation), GEO_CHUNK_ROWS)
+    )
+
+
+def geo_avg_from_chunks(chunks):
+    """Mean coordinates per zip prefix over an iterable of GEO_CHUNK_ROWS-row geolocation chunks.
+
+    Only per-zip coordinate sums and row counts are kept between chunks, so
+    memory grows with the number of zip prefixes rather than with the table.
+    """
+    sums, counts = None, None
+    for chunk in chunks:
+        grouped = chunk[GEO_COLS].groupby("geolocation_zip_code_prefix")
+        part_sums, part_counts = grouped.sum(), grouped.count()
+        sums = part_sums if sums is None else sums.add(part_sums, fill_value=0)
+        counts = part_counts if counts is None else counts.add(part_counts, fill_value=0)
+    if sums is None:
+        return pd.DataFrame(columns=GEO_COLS)
+    return (sums / counts).sort_index().reset_index()
+
+
+def add_product_features(products):
+    products = products.copy()
+    products["product_category_name"] = products["product_category_name"].fillna("unknown")
+    products["is_category_missing"] = (products["product_category_name"] == "unknown").astype(int)
+    products["product_volume_cm3"] = (
+        products["product_length_cm"] * products["product_height_cm"] * products["product_width_cm"]
+    )
+    products["is_large_product"] = (products["product_weight_g"] > 10000) | (products["product_volume_cm3"] > 100000)
+    return products
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+
+def build_order_features(orders, order_items, customers, payments, reviews,
+                         products, sellers, geo_avg, verbose=True):
+    """Build the model-ready frame for a set of orders.
+
+    `products` must already carry the columns from add_product_features().
+    Every order only needs its own items, customer, payments and reviews, so
+    this can run on the full tables or on one shard from partition_orders().
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+
+    log("\nMerging shipping limit timestamps into orders...")
+    orders = orders.merge(
+        order_items[["order_id", "shipping_limit_date"]],
+        on="order_id",
+        how="left"
+    )
+
+    log("\nMerging geolocation data into customers and sellers...")
+    customers = customers.merge(
+        geo_avg,
+        how="left",
+        left_on="customer_zip_code_prefix",
+        right_on="geolocation_zip_code_prefix"
+    ).rename(columns={"geolocation_lat": "customer_lat", "geolocation_lng": "customer_lng"})
+
+    sellers = sellers.merge(
+        geo_avg,
+        how="left",
+        left_on="seller_zip_code_prefix",
+        right_on="geolocation_zip_code_prefix"
+    ).rename(columns={"geolocation_lat": "seller_lat", "geolocation_lng": "seller_lng"})
+
+    log("\nCalculating customer-seller distances...")
+    orders_geo = orders.merge(customers[["customer_id", "customer_lat", "customer_lng"]], on="customer_id", how="left")
+    orders_geo = orders_geo.merge(order_items.merge(sellers[["seller_id", "seller_lat", "seller_lng"]], on="seller_id", how="left"),
+                                  on="order_id", how="left")
+
+    orders_geo["customer_seller_distance_km"] = orders_geo.apply(
+        lambda row: haversine(row["customer_lat"], row["customer_lng"], row["seller_lat"], row["seller_lng"])
+        if pd.notnull(row["customer_lat"]) and pd.notnull(row["seller_lat"]) else None,
+        axis=1
+    )
+
+    orders = orders.merge(
+        orders_geo[["order_id", "customer_seller_distance_km"]].groupby("order_id").mean().reset_index(),
+        on="order_id",
+        how="left"
+    )
+
+    log("Distance feature added.\n")
+
+    log("Generating delivery-related features...")
+    orders["order_purchase_timestamp"] = pd.to_datetime(orders["order_purchase_timestamp"])
+    orders["order_approved_at"] = pd.to_datetime(orders["order_approved_at"])
+    orders["order_delivered_customer_date"] = pd.to_datetime(orders["order_delivered_customer_date"])
+    orders["order_estimated_delivery_date"] = pd.to_datetime(orders["order_estimated_delivery_date"])
+    orders["shipping_limit_date"] = pd.to_datetime(orders["shipping_limit_date"])
+
+    orders["is_delivered"] = orders["order_delivered_customer_date"].notnull().astype(int)
+    orders["delivery_time_days"] = (orders["order_delivered_customer_date"] - orders["order_purchase_timestamp"]).dt.days
+    orders["is_late"] = (orders["order_delivered_customer_date"] > orders["order_estimated_delivery_date"]).fillna(False).astype(int)
+    orders["shipping_window_days"] = (orders["shipping_limit_date"] - orders["order_purchase_timestamp"]).dt.days
+    orders["promised_delivery_days"] = (orders["order_estimated_delivery_date"] - orders["order_purchase_timestamp"]).dt.days
+    orders["approval_delay_days"] = (orders["order_approved_at"] - orders["order_purchase_timestamp"]).dt.days
+
+    log("\nGenerating review and payment features...")
+    reviews = reviews.copy()
+    payments = payments.copy()
+    reviews["has_review"] = reviews["review_comment_message"].notnull().astype(int)
+    payments["payment_installments"] = payments["payment_installments"].fillna(0)
+    payments["payment_value"] = payments["payment_value"].fillna(0)
+
+    log("\nMerging all features into model-ready dataset...")
+    df = orders.merge(customers, on="customer_id", how="left")
+    df = df.merge(order_items, on="order_id", how="left")
+    df = df.merge(products, on="product_id", how="left")
+    df = df.merge(sellers, on="seller_id", how="left")
+    df = df.merge(
+        payments.groupby("order_id").agg({
+            "payment_value": "sum",
+            "payment_installments": "sum"
+        }).reset_index(),
+        on="order_id", how="left"
+    )
+    df = df.merge(reviews[["order_id", "review_score", "has_review"]], on="order_id", how="left")
+
+    log("\nAdding order item count and price features...")
+    order_item_counts = order_items.groupby("order_id")["order_item_id"].max().reset_index()
+    order_item_counts.rename(columns={"order_item_id": "num_items"}, inplace=True)
+    df = df.merge(order_item_counts, on="order_id", how="left")
+
+    df = df.drop_duplicates(subset=["order_id"])
+    df["total_price"] = df["price"] + df["freight_value"]
+    df["log_distance_seller_customer"] = np.log1p(df["customer_seller_distance_km"])
+
+    log("\nFinal cleanup and target feature creation...")
+    df["delivery_time_days"] = df["delivery_time_days"].fillna(-1).astype(int)
+    df["review_score"] = df["review_score"].fillna(0).astype(int)
+    df["delivered_late"] = df["is_late"]
+    for col in NULLABLE_INT_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("Int64")
+    return df
+
+
+# =============== Sharded execution ===============
+
+def shard_ids(keys, n_shards):
+    """Stable hash partition of a key column into n_shards buckets."""
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+def _split_by_shard(df, shard, n_shards):
+    order = np.argsort(shard, kind="stable")
+    bounds = np.cumsum(np.bincount(shard, minlength=n_shards))[:-1]
+    return [df.iloc[idx] for idx in np.split(order, bounds)]
+
+
+def partition_orders(tables, n_shards):
+    """Hash-partition orders and their items, payments, reviews and customers.
+
+    Returns a list of n_shards dicts keyed like SHARDED_TABLES. Orders get an
+    `_order_pos` column so the concatenated result can be put back in the
+    original order.
+    """
+    orders = tables["orders"].assign(_order_pos=np.arange(len(tables["orders"])))
+    order_shard = shard_ids(orders["order_id"], n_shards)
+
+    customer_shard = pd.DataFrame({
+        "customer_id": orders["customer_id"].to_numpy(),
+        "_shard": order_shard
+    }).drop_duplicates()
+    customers = tables["customers"].merge(customer_shard, on="customer_id", how="inner")
+
+    parts = {
+        "orders": _split_by_shard(orders, order_shard, n_shards),
+        "customers": [
+            part.drop(columns="_shard")
+            for part in _split_by_shard(customers, customers["_shard"].to_numpy(), n_shards)
+        ],
+    }
+    for name in ["order_items", "payments", "reviews"]:
+        table = tables[name]
+        parts[name] = _split_by_shard(table, shard_ids(table["order_id"], n_shards), n_shards)
+
+    return [{name: parts[name][i] for name in SHARDED_TABLES} for i in range(n_shards)]
+
+
+def broadcast_frames(frames, directory):
+    """Write small dimension tables as .npy columns for memory-mapped reads.
+
+    String columns are stored as categorical codes plus a fixed-width
+    unicode dictionary, so every column can be opened with mmap_mode="r" and
+    no worker has to unpickle its own copy. Returns the layout needed by
+    load_broadcast().
+    """
+    layout = {}
+    for name, df in frames.items():
+        columns = []
+        for i, col in enumerate(df.columns):
+            values = df[col]
+            base = os.path.join(directory, f"{name}_{i}")
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                np.save(base + ".npy", values.to_numpy())
+                columns.append((col, "values"))
+            else:
+                # Codes already in the integer width pandas picks for this many
+                # categories, so load_broadcast() can wrap the map without a copy
+                categorical = pd.Categorical(values)
+                np.save(base + ".npy", categorical.codes)
+                np.save(base + "_dict.npy", np.asarray(categorical.categories, dtype=str))
+                columns.append((col, "codes"))
+        layout[name] = columns
+    return layout
+
+
+def load_broadcast(directory, layout):
+    """Open the frames written by broadcast_frames().
+
+    Numeric columns are the memory maps themselves; string columns come back
+    as pd.Categorical over the mapped codes, so only their (small) category
+    dictionaries are materialized per worker. Merges on categorical keys give
+    the same rows as on the original strings.
+    """
+    frames = {}
+    for name, columns in layout.items():
+        data = {}
+        for i, (col, kind) in enumerate(columns):
+            base = os.path.join(directory, f"{name}_{i}")
+            values = np.load(base + ".npy", mmap_mode="r")
+            if kind == "codes":
+                categories = np.load(base + "_dict.npy", mmap_mode="r")
+                values = pd.Categorical.from_codes(values, categories=pd.Index(categories.tolist()),
+                                                   validate=False)
+            data[col] = values
+        frames[name] = pd.DataFrame(data, copy=False)
+    return frames
+
+
+_BROADCAST = {}
+
+
+def _init_worker(directory, layout):
+    _BROADCAST.update(load_broadcast(directory, layout))
+
+
+def _run_shard(shard):
+    return build_order_features(**shard, **_BROADCAST, verbose=False)
+
+
+def run_sharded(tables, n_shards, max_workers=None):
+    """Run build_order_features() over n_shards order partitions in parallel.
+
+    `tables` holds the SHARDED_TABLES and BROADCAST_TABLES frames. The result
+    has the same rows, columns, row order and dtypes as a single serial call.
+    """
+    max_workers = max_workers or min(n_shards, os.cpu_count() or 1)
+    shards = [shard for shard in partition_orders(tables, n_shards) if len(shard["orders"])]
+
+    with tempfile.TemporaryDirectory(prefix="olist_broadcast_") as directory:
+        layout = broadcast_frames({name: tables[name] for name in BROADCAST_TABLES}, directory)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(directory, layout)) as pool:
+            parts = list(pool.map(_run_shard, shards))
+
+    df = pd.concat(parts, ignore_index=True)
+    df = df.sort_values("_order_pos", kind="stable").drop(columns="_order_pos")
+
+    # Broadcast string columns reach the workers as categoricals (and merge keys
+    # on them come out as object); give them back the dtypes of a serial run
+    for name in BROADCAST_TABLES:
+        for col, dtype in tables[name].dtypes.items():
+            if col in df.columns and df[col].dtype != dtype and not pd.api.types.is_numeric_dtype(dtype):
+                df[col] = df[col].astype(dtype)
+    return df.reset_index(drop=True)
+
+
+# =============== Spilled partitions (memory budget) ===============
+
+# Rough in-memory size of one cleaned order row with its share of the other
+# sharded tables, used to size read chunks and partitions
+ORDER_ROW_BYTES = 1_000
+
+# Peak memory of a batch's joins relative to its spilled (pickled) size
+JOIN_EXPANSION = 8
+
+
+def _spill(df, part, table, directory, seq):
+    table_dir = os.path.join(directory, table)
+    os.makedirs(table_dir, exist_ok=True)
+    schema_path = os.path.join(table_dir, "schema.pkl")
+    if not os.path.exists(schema_path):
+        df.iloc[:0].to_pickle(schema_path)
+    for p in np.unique(part):
+        df[part == p].to_pickle(os.path.join(table_dir, f"{p:06d}_{seq:06d}.pkl"))
+
+
+def _part_files(directory, table, p):
+    return sorted(glob.glob(os.path.join(directory, table, f"{p:06d}_*.pkl")))
+
+
+def _load_part(directory, table, parts):
+    files = [f for p in parts for f in _part_files(directory, table, p)]
+    if not files:
+        return pd.read_pickle(os.path.join(directory, table, "schema.pkl"))
+    return pd.concat([pd.read_pickle(f) for f in files], ignore_index=True)
+
+
+def spill_order_partitions(read_chunks, rows_per_part, directory):
+    """Stream the sharded tables to disk as partitions of consecutive orders.
+
+    `read_chunks(table)` must yield DataFrame chunks for each of
+    SHARDED_TABLES. Orders are cut into runs of `rows_per_part` rows in file
+    order; items, payments and reviews are routed to their order's partition
+    through an order_id -> partition lookup, and customers likewise through
+    customer_id. Only one chunk plus the lookups is held in memory.
+    Returns the number of partitions written.
+    """
+    offset, seq = 0, 0
+    order_parts, customer_parts = [], []
+    for chunk in read_chunks("orders"):
+        part = (offset + np.arange(len(chunk))) // rows_per_part
+        offset += len(chunk)
+        _spill(chunk, part, "orders", directory, seq)
+        seq += 1
+        order_parts.append(pd.Series(part, index=chunk["order_id"].to_numpy()))
+        customer_parts.append(pd.DataFrame({"customer_id": chunk["customer_id"].to_numpy(), "_part": part}))
+    n_parts = -(-offset // rows_per_part)
+
+    order_part = pd.concat(order_parts)
+    order_part = order_part[~order_part.index.duplicated()]
+    customer_part = pd.concat(customer_parts).drop_duplicates()
+    del order_parts, customer_parts
+
+    for table in ["order_items", "payments", "reviews"]:
+        for chunk in read_chunks(table):
+            part = order_part.reindex(chunk["order_id"].to_numpy()).to_numpy()
+            matched = ~np.isnan(part)
+            _spill(chunk[matched], part[matched].astype(np.int64), table, directory, seq)
+            seq += 1
+
+    for chunk in read_chunks("customers"):
+        chunk = chunk.merge(customer_part, on="customer_id", how="inner")
+        _spill(chunk.drop(columns="_part"), chunk["_part"].to_numpy(), "customers", directory, seq)
+        seq += 1
+    return n_parts
+
+
+def iter_spilled_features(directory, n_parts, dims, batch_bytes):
+    """Yield build_order_features() results for spilled partitions, in order.
+
+    Consecutive partitions are grouped until their spilled size reaches
+    `batch_bytes`, so each batch's joins stay within the memory budget.
+    `dims` holds the BROADCAST_TABLES frames.
+    """
+    batch, size = [], 0
+    for p in range(n_parts):
+        part_size = sum(os.path.getsize(f) for table in SHARDED_TABLES for f in _part_files(directory, table, p))
+        if batch and size + part_size > batch_bytes:
+            yield _build_batch(directory, batch, dims)
+            batch, size = [], 0
+        batch.append(p)
+        size += part_size
+    if batch:
+        yield _build_batch(directory, batch, dims)
+
+
+def _build_batch(directory, parts, dims):
+    shard = {table: _load_part(directory, table, parts) for table in SHARDED_TABLES}
+    return build_order_features(**shard, **dims, verbose=False)
@@ -1,8 +1,8 @@
-import pandas as pd
+import artifact_store
 
 # Load dataset
 print("Loading model-ready dataset...")
-df = pd.read_csv("../data/processed/olist_model_ready.csv")
+df = artifact_store.read("olist_model_ready")
 print("Initial shape:", df.shape)
 
 # Drop raw timestamp columns
@@ -36,8 +36,16 @@ if "Unnamed: 0" in df.columns:
     print("Dropping redundant index column: 'Unnamed: 0'")
     df.drop(columns=["Unnamed: 0"], inplace=True)
 
+# Join per-order review text features when the text stage has produced them
+if artifact_store.exists("review_text_features"):
+    print("Joining review text features on order_id...")
+    text_features = artifact_store.read("review_text_features")
+    df = df.merge(text_features, how="left", on="order_id")
+    text_cols = [col for col in text_features.columns if col != "order_id"]
+    df[text_cols] = df[text_cols].fillna(0).astype(int)
+
 # Save cleaned dataset
-print("Saving cleaned dataset to final_ml_ready.csv...")
-df.to_csv("../data/processed/final_ml_ready.csv", index=False)
-print("Cleanup complete. Saved ML-ready dataset at: ../data/processed/final_ml_ready.csv")
+print("Saving cleaned dataset to final_ml_ready...")
+entry = artifact_store.write("final_ml_ready", df, stage="final_cleanup")
+print(f"Cleanup complete. Saved ML-ready dataset at: ../data/processed/final_ml_ready/{entry['file']}")
 print("Shape:", df.shape)
\ No newline at end of file
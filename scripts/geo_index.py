@@ -0,0 +1,380 @@
+"""Spatial index over zip-prefix centroids and seller locations.
+
+Answers nearest-seller and radius questions without computing every
+customer-seller distance:
+
+    sellers = load_seller_locations()
+    index = GeoIndex(sellers["seller_lat"], sellers["seller_lng"])
+    dist_km, idx = index.query_knn(lat, lng, k=5)            # batched k-nearest
+    query_idx, point_idx, dist_km = index.query_radius(lat, lng, 300)
+
+    sellers_near_zip("01310", radius_km=300)
+
+Distances are great-circle (haversine) kilometres. With scikit-learn
+installed (`pip install scikit-learn`) the index is a BallTree on radians
+with the haversine metric; otherwise a lat/lng grid is used. Both backends
+return the same, exact results.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import artifact_store
+import features
+
+EARTH_RADIUS_KM = 6371
+
+# Upper edges (km) of the customer-seller distance bands; the last band is open
+DISTANCE_BANDS = [50, 150, 300, 600, 1000, 2000]
+
+# Radii (km) for the sellers_within_<r>km features
+SELLER_RADII_KM = [100, 300]
+
+QUERY_BATCH = 1024
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Vectorized great-circle distance in km; inputs broadcast like numpy arrays."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _haversine_rad(lat1, lng1, cos1, lat2, lng2, cos2):
+    """haversine_km on coordinates already in radians, with their cosines precomputed."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _sklearn_balltree():
+    try:
+        from sklearn.neighbors import BallTree
+    except ImportError:
+        return None
+    return BallTree
+
+
+class GeoIndex:
+    """Exact k-nearest and radius queries over a fixed set of lat/lng points.
+
+    `backend` is "balltree" (needs scikit-learn), "grid" or None to pick
+    the BallTree when available. `cell_deg` sets the grid cell size.
+    """
+
+    def __init__(self, lat, lng, backend=None, cell_deg=1.0):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        if len(self.lat) != len(self.lng):
+            raise ValueError("lat and lng must have the same length")
+        if np.isnan(self.lat).any() or np.isnan(self.lng).any():
+            raise ValueError("GeoIndex points must not contain missing coordinates")
+
+        BallTree = _sklearn_balltree() if backend in (None, "balltree") else None
+        if backend == "balltree" and BallTree is None:
+            raise ValueError("backend='balltree' needs scikit-learn (pip install scikit-learn)")
+        if backend not in (None, "balltree", "grid"):
+            raise ValueError(f"Unknown GeoIndex backend: {backend}")
+        self.backend = "balltree" if BallTree is not None else "grid"
+
+        if self.backend == "balltree":
+            self._tree = BallTree(np.radians(np.column_stack([self.lat, self.lng])), metric="haversine")
+        else:
+            self._build_grid(cell_deg)
+
+    def __len__(self):
+        return len(self.lat)
+
+    # =============== Grid backend ===============
+
+    def _build_grid(self, cell_deg):
+        self.cell_deg = cell_deg
+        self.n_rows = int(np.ceil(180 / cell_deg)) + 1
+        self.n_cols = int(np.ceil(360 / cell_deg))
+        keys = self._cell_keys(self.lat, self.lng)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        self._rad = _radians_with_cos(self.lat, self.lng)
+
+    def _cell_rows_cols(self, lat, lng):
+        rows = np.floor((lat + 90) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lng + 180) / self.cell_deg).astype(np.int64) % self.n_cols
+        return rows, cols
+
+    def _cell_keys(self, lat, lng):
+        rows, cols = self._cell_rows_cols(lat, lng)
+        return rows * self.n_cols + cols
+
+    def _window(self, row, col, ring):
+        """Indices of points in the cells within `ring` cells of (row, col)."""
+        if 2 * ring + 1 >= self.n_cols and 2 * ring + 1 >= self.n_rows:
+            return self._order
+        row_range = range(max(row - ring, 0), min(row + ring, self.n_rows - 1) + 1)
+        if 2 * ring + 1 >= self.n_cols:
+            col_spans = [(0, self.n_cols - 1)]
+        else:
+            lo, hi = (col - ring) % self.n_cols, (col + ring) % self.n_cols
+            col_spans = [(lo, hi)] if lo <= hi else [(lo, self.n_cols - 1), (0, hi)]
+        parts = []
+        for r in row_range:
+            for lo, hi in col_spans:
+                start, stop = np.searchsorted(self._keys, [r * self.n_cols + lo, r * self.n_cols + hi + 1])
+                parts.append(self._order[start:stop])
+        return np.concatenate(parts)
+
+    def _covered_km(self, row, ring):
+        """Distance from anywhere in cell row `row` that the window of `ring` cells is sure to cover."""
+        if 2 * ring + 1 >= self.n_cols and 2 * ring + 1 >= self.n_rows:
+            return np.inf
+        span = np.radians(ring * self.cell_deg)
+        lat_km = EARTH_RADIUS_KM * span
+        if 2 * ring + 1 >= self.n_cols:
+            return lat_km
+        # Nearest point on a meridian `span` away from a point at latitude phi
+        phi = np.radians(min(max(abs(row * self.cell_deg - 90), abs((row + 1) * self.cell_deg - 90)), 90))
+        lng_km = EARTH_RADIUS_KM * np.arcsin(np.cos(phi) * np.sin(min(span, np.pi / 2)))
+        return min(lat_km, lng_km)
+
+    def _distances(self, query_rad, queries, candidates):
+        qlat, qlng, qcos = (x[queries, None] for x in query_rad)
+        plat, plng, pcos = (x[candidates] for x in self._rad)
+        return _haversine_rad(qlat, qlng, qcos, plat, plng, pcos)
+
+    def _radius_ring(self, row, radius_km):
+        ring = 1
+        while self._covered_km(row, ring) < radius_km:
+            ring += 1
+        return ring
+
+    def _grouped_queries(self, lat, lng):
+        """(row, col, query positions) for each grid cell holding query points."""
+        rows, cols = self._cell_rows_cols(lat, lng)
+        keys = rows * self.n_cols + cols
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for group in np.split(order, bounds):
+            for batch in np.array_split(group, -(-len(group) // QUERY_BATCH)):
+                yield rows[batch[0]], cols[batch[0]], batch
+
+    def _grid_knn(self, lat, lng, k):
+        dist = np.empty((len(lat), k))
+        idx = np.empty((len(lat), k), dtype=np.int64)
+        query_rad = _radians_with_cos(lat, lng)
+        for row, col, queries in self._grouped_queries(lat, lng):
+            ring = 1
+            while True:
+                candidates = self._window(row, col, ring)
+                if len(candidates) >= k:
+                    d = self._distances(query_rad, queries, candidates)
+                    nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+                    kth = np.take_along_axis(d, nearest, axis=1).max(axis=1)
+                    if kth.max() <= self._covered_km(row, ring):
+                        break
+                ring *= 2
+            near_d = np.take_along_axis(d, nearest, axis=1)
+            order = np.argsort(near_d, axis=1, kind="stable")
+            dist[queries] = np.take_along_axis(near_d, order, axis=1)
+            idx[queries] = candidates[np.take_along_axis(nearest, order, axis=1)]
+        return dist, idx
+
+    def _grid_radius(self, lat, lng, radius_km):
+        pairs = []
+        query_rad = _radians_with_cos(lat, lng)
+        for row, col, queries in self._grouped_queries(lat, lng):
+            candidates = self._window(row, col, self._radius_ring(row, radius_km))
+            d = self._distances(query_rad, queries, candidates)
+            q, c = np.nonzero(d <= radius_km)
+            pairs.append((queries[q], candidates[c], d[q, c]))
+        return pairs
+
+    def _grid_count(self, lat, lng, radius_km):
+        counts = np.zeros(len(lat), dtype=np.int64)
+        query_rad = _radians_with_cos(lat, lng)
+        for row, col, queries in self._grouped_queries(lat, lng):
+            candidates = self._window(row, col, self._radius_ring(row, radius_km))
+            counts[queries] = (self._distances(query_rad, queries, candidates) <= radius_km).sum(axis=1)
+        return counts
+
+    # =============== Queries ===============
+
+    def query_knn(self, lat, lng, k=1):
+        """Distances (km) and indices of the k nearest points to each query, nearest first.
+
+        Returns two (n_queries, k) arrays.
+        """
+        lat, lng = _as_query(lat, lng)
+        if not 1 <= k <= len(self):
+            raise ValueError(f"k must be between 1 and the number of indexed points ({len(self)})")
+        if self.backend == "balltree":
+            dist, idx = self._tree.query(np.radians(np.column_stack([lat, lng])), k=k)
+            return dist * EARTH_RADIUS_KM, idx
+        return self._grid_knn(lat, lng, k)
+
+    def query_radius(self, lat, lng, radius_km, sort_results=True):
+        """All (query, point) pairs within radius_km, as flat arrays.
+
+        Returns (query_idx, point_idx, distance_km), sorted by query and then
+        by distance unless sort_results is False.
+        """
+        lat, lng = _as_query(lat, lng)
+        if self.backend == "balltree":
+            points, dists = self._tree.query_radius(
+                np.radians(np.column_stack([lat, lng])), r=radius_km / EARTH_RADIUS_KM, return_distance=True
+            )
+            counts = np.array([len(p) for p in points], dtype=np.int64)
+            pairs = [(np.repeat(np.arange(len(lat)), counts),
+                      np.concatenate(points).astype(np.int64) if len(points) else np.empty(0, dtype=np.int64),
+                      np.concatenate(dists) * EARTH_RADIUS_KM if len(dists) else np.empty(0))]
+        else:
+            pairs = self._grid_radius(lat, lng, radius_km)
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        query_idx, point_idx, dist = (np.concatenate(parts) for parts in zip(*pairs))
+        if not sort_results:
+            return query_idx, point_idx, dist
+        order = np.lexsort((point_idx, dist, query_idx))
+        return query_idx[order], point_idx[order], dist[order]
+
+    def count_within(self, lat, lng, radius_km):
+        """Number of indexed points within radius_km of each query."""
+        lat, lng = _as_query(lat, lng)
+        if self.backend == "balltree":
+            return self._tree.query_radius(
+                np.radians(np.column_stack([lat, lng])), r=radius_km / EARTH_RADIUS_KM, count_only=True
+            ).astype(np.int64)
+        return self._grid_count(lat, lng, radius_km)
+
+
+def _radians_with_cos(lat, lng):
+    lat, lng = np.radians(lat), np.radians(lng)
+    return lat, lng, np.cos(lat)
+
+
+def _as_query(lat, lng):
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+    lng = np.atleast_1d(np.asarray(lng, dtype=float))
+    if np.isnan(lat).any() or np.isnan(lng).any():
+        raise ValueError("Query coordinates must not be missing")
+    return lat, lng
+
+
+# =============== Olist locations ===============
+
+def load_zip_centroids(root=None):
+    """Mean lat/lng per zip-code prefix from the cleaned geolocation data."""
+    return features.compute_geo_avg(artifact_store.read(
+        "geolocation_clean", root=root,
+        usecols=["geolocation_zip_code_prefix", "geolocation_lat", "geolocation_lng"]
+    ))
+
+
+def seller_locations(sellers, geo_avg):
+    """Sellers with seller_lat/seller_lng from their zip centroid; sellers without one are dropped."""
+    located = sellers.merge(
+        geo_avg, how="inner", left_on="seller_zip_code_prefix", right_on="geolocation_zip_code_prefix"
+    ).rename(columns={"geolocation_lat": "seller_lat", "geolocation_lng": "seller_lng"})
+    return located.drop(columns="geolocation_zip_code_prefix").reset_index(drop=True)
+
+
+def load_seller_locations(root=None, geo_avg=None):
+    geo_avg = load_zip_centroids(root) if geo_avg is None else geo_avg
+    return seller_locations(artifact_store.read("seller_clean", root=root), geo_avg)
+
+
+def sellers_near_zip(zip_prefix, radius_km=None, k=None, sellers=None, geo_avg=None, index=None):
+    """Sellers within radius_km of (or the k nearest to) a customer zip prefix.
+
+    Returns the matching seller rows with a distance_km column, nearest
+    first. Pass `sellers`, `geo_avg` and `index` to reuse them across calls.
+    """
+    if (radius_km is None) == (k is None):
+        raise ValueError("Give exactly one of radius_km or k")
+    geo_avg = load_zip_centroids() if geo_avg is None else geo_avg
+    sellers = load_seller_locations(geo_avg=geo_avg) if sellers is None else sellers
+    index = GeoIndex(sellers["seller_lat"], sellers["seller_lng"]) if index is None else index
+
+    centroid = geo_avg[geo_avg["geolocation_zip_code_prefix"] == int(zip_prefix)]
+    if centroid.empty:
+        raise ValueError(f"Unknown zip code prefix: {zip_prefix}")
+    lat, lng = centroid["geolocation_lat"].iloc[0], centroid["geolocation_lng"].iloc[0]
+
+    if k is not None:
+        dist, idx = index.query_knn(lat, lng, k=min(k, len(index)))
+        dist, idx = dist[0], idx[0]
+    else:
+        _, idx, dist = index.query_radius(lat, lng, radius_km)
+    return sellers.iloc[idx].assign(distance_km=dist).reset_index(drop=True)
+
+
+# =============== Distance-band features ===============
+
+def band_labels(bands=DISTANCE_BANDS):
+    edges = [0] + list(bands)
+    return [f"{lo}-{hi}km" for lo, hi in zip(edges, edges[1:])] + [f"{edges[-1]}km+"]
+
+
+def distance_band(distance_km, bands=DISTANCE_BANDS):
+    """Band index of each distance (0 = nearest band), -1 where the distance is missing."""
+    distance_km = np.asarray(distance_km, dtype=float)
+    band = np.searchsorted(np.asarray(bands, dtype=float), distance_km, side="left")
+    return np.where(np.isnan(distance_km), -1, band).astype(np.int8)
+
+
+def add_distance_features(df, index, radii_km=SELLER_RADII_KM):
+    """Add distance-band and seller-density columns to a model-ready frame.
+
+    - distance_band: band of customer_seller_distance_km (see band_labels())
+    - nearest_seller_km: distance from the customer to the closest seller
+    - sellers_within_<r>km: sellers within each radius of the customer
+
+    Queries run once per distinct customer location, so the cost grows with
+    the number of zip prefixes, not orders.
+    """
+    df = df.copy()
+    df["distance_band"] = distance_band(df["customer_seller_distance_km"])
+
+    coords = df[["customer_lat", "customer_lng"]]
+    located = coords.notna().all(axis=1).to_numpy()
+    points = coords[located].drop_duplicates()
+    lat, lng = points["customer_lat"].to_numpy(), points["customer_lng"].to_numpy()
+
+    per_point = pd.DataFrame({"customer_lat": lat, "customer_lng": lng})
+    per_point["nearest_seller_km"] = index.query_knn(lat, lng, k=1)[0][:, 0] if len(points) else []
+    for radius in radii_km:
+        per_point[f"sellers_within_{radius}km"] = index.count_within(lat, lng, radius) if len(points) else []
+
+    looked_up = coords.merge(per_point, how="left", on=["customer_lat", "customer_lng"])
+    # Customers without coordinates leave gaps; the seller counts use nullable
+    # Int64 so a batch with or without them writes the same values
+    df["nearest_seller_km"] = looked_up["nearest_seller_km"].to_numpy(dtype="float64")
+    for radius in radii_km:
+        col = f"sellers_within_{radius}km"
+        df[col] = looked_up[col].astype("Int64").to_numpy()
+    return df
+
+
+def late_rate_by_band(df, bands=DISTANCE_BANDS):
+    """Orders and late-delivery rate per distance band of a frame with distance_band."""
+    grouped = df[df["distance_band"] >= 0].groupby("distance_band")["delivered_late"].agg(["size", "mean"])
+    labels = band_labels(bands)
+    return pd.DataFrame({
+        "distance_band": [labels[i] for i in grouped.index],
+        "orders": grouped["size"].to_numpy(),
+        "late_rate": grouped["mean"].to_numpy(),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sellers near an Olist customer zip prefix.")
+    parser.add_argument("zip_prefix", help="Customer zip code prefix, e.g. 01310")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--radius", type=float, help="Sellers within this many km")
+    group.add_argument("--k", type=int, help="The k nearest sellers")
+    args = parser.parse_args(argv)
+
+    result = sellers_near_zip(args.zip_prefix, radius_km=args.radius, k=args.k)
+    print(result[["seller_id", "seller_city", "seller_state", "distance_km"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
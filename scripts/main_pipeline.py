@@ -1,10 +1,47 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
-import time
+"""Pipeline entry point.
+
+Usage (from the repo root or scripts/):
+    python scripts/main_pipeline.py [clean|validate|features|eda|plots|cube|export|model|score|all]
+                                    [--shards N] [--max-memory 4G] [--threads N]
+
+Only the standard library is imported here. Each stage script imports pandas,
+numpy or matplotlib itself, so a stage only pays for the libraries it uses.
+"""
+import argparse
+import gc
 import importlib
+import os
+import sys
+import time
 from datetime import datetime
 
+import memory_budget
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (script, display name, subcommand) in full-pipeline order
+PIPELINE_STEPS = [
+    ("data_cleaning", "Data Cleaning", "clean"),
+    ("data_validation", "Data Validation", "validate"),
+    ("feature_engineering", "Feature Engineering", "features"),
+    ("review_text_features", "Review Text Features", "features"),
+    ("final_cleanup", "Final Cleanup", "features"),
+    ("eda_summary", "EDA Summary", "eda"),
+    ("eda_insights", "EDA Insights", "eda"),
+    ("eda_plots", "EDA Plots", "plots"),
+    ("eda_business_needs", "EDA Business Needs", "eda"),
+    ("eda_business_plots", "EDA Business Plots", "plots"),
+    ("build_cube", "Build Delivery Cube", "cube"),
+    ("dashboard_export", "Dashboard Export", "export"),
+    ("train_model", "Train Delivery Model", "model"),
+    ("score_orders", "Score Orders", "score")
+]
+
+COMMANDS = ["clean", "validate", "features", "eda", "plots", "cube", "export", "model", "score", "all"]
+
+# Peak RSS in bytes of each stage run in this process, by display name
+stage_peaks = {}
+
 
 def print_header(title):
     print(f"\nStarting: {title}")
@@ -12,6 +49,18 @@ def print_header(title):
 def print_success(title):
     print(f"Completed: {title}\n")
 
+def print_peak_memory(title, workers_before=None):
+    peak = memory_budget.peak_rss_bytes()
+    if peak is None:
+        return
+    stage_peaks[title] = peak
+    line = f"Peak memory: {memory_budget.format_bytes(peak)}"
+    # The child peak is process-wide, so only report it when this stage raised it
+    workers = memory_budget.peak_child_rss_bytes()
+    if workers and workers != workers_before:
+        line += f" (largest child process: {memory_budget.format_bytes(workers)})"
+    print(line)
+
 def print_error(title, error):
     print(f"Error in {title}: {error}\n")
 
@@ -19,35 +68,40 @@ def run_script(script_name, display_name):
     try:
         print_header(display_name)
         print(f"Running {script_name}.py...")
-        module = importlib.import_module(script_name)
-        importlib.reload(module)
+        memory_budget.reset_peak_rss()
+        workers_before = memory_budget.peak_child_rss_bytes()
+        # Stage scripts do their work at import time, so each run is a fresh
+        # import of the module.
+        sys.modules.pop(script_name, None)
+        importlib.import_module(script_name)
+        print_peak_memory(display_name, workers_before)
         print_success(display_name)
         return True
     except Exception as e:
         print_error(display_name, e)
         print("Continuing to next step.")
         return False
+    finally:
+        release_stage(script_name)
+
+def release_stage(script_name):
+    """Free a finished stage's module-level frames and open figures before the next stage."""
+    sys.modules.pop(script_name, None)
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is not None:
+        pyplot.close("all")
+    gc.collect()
+
+def run_pipeline(command="all"):
+    """Run the pipeline steps selected by `command` ("all" runs every step)."""
+    steps = [step for step in PIPELINE_STEPS if command == "all" or step[2] == command]
 
-def run_pipeline():
-    """Run the full pipeline."""
     start_time = time.time()
     print(f"\nPipeline started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("Executing all steps in sequence...\n")
 
-    pipeline_steps = [
-        ("data_cleaning", "Data Cleaning"),
-        ("data_validation", "Data Validation"),
-        ("feature_engineering", "Feature Engineering"),
-        ("final_cleanup", "Final Cleanup"),
-        ("eda_summary", "EDA Summary"),
-        ("eda_insights", "EDA Insights"),
-        ("eda_plots", "EDA Plots"),
-        ("eda_business_needs", "EDA Business Needs"),
-        ("eda_business_plots", "EDA Business Plots")
-    ]
-
     completed_steps = []
-    for script_name, display_name in pipeline_steps:
+    for script_name, display_name, _ in steps:
         if run_script(script_name, display_name):
             completed_steps.append(display_name)
 
@@ -59,12 +113,45 @@ def run_pipeline():
 
     print("Completed steps:")
     for step in completed_steps:
-        print(f"- {step}")
+        peak = stage_peaks.get(step)
+        print(f"- {step}" + (f" (peak {memory_budget.format_bytes(peak)})" if peak else ""))
 
-    if len(completed_steps) < len(pipeline_steps):
+    if len(completed_steps) < len(steps):
         print("\nSome steps failed. Review the error messages above.")
-    else:
-        print("\nAll steps executed successfully.")
+        return False
+    print("\nAll steps executed successfully.")
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Olist data pipeline or a single stage.")
+    parser.add_argument("command", nargs="?", default="all", choices=COMMANDS,
+                        help="Stage to run (default: all)")
+    parser.add_argument("--shards", type=int,
+                        help="Order shards for feature engineering (sets OLIST_FEATURE_SHARDS)")
+    parser.add_argument("--max-memory", metavar="SIZE",
+                        help="Memory budget such as 4G or 512M (sets OLIST_MAX_MEMORY); "
+                             "sizes read chunks and spills feature-engineering joins to disk")
+    parser.add_argument("--threads", type=int,
+                        help="Threads for model training and scoring (sets OLIST_MODEL_THREADS)")
+    args = parser.parse_args(argv)
+
+    if args.shards:
+        os.environ["OLIST_FEATURE_SHARDS"] = str(args.shards)
+    if args.max_memory:
+        try:
+            memory_budget.parse_size(args.max_memory)
+        except ValueError as e:
+            parser.error(str(e))
+        os.environ["OLIST_MAX_MEMORY"] = args.max_memory
+    if args.threads:
+        os.environ["OLIST_MODEL_THREADS"] = str(args.threads)
+
+    # Stage scripts read and write ../data relative to scripts/
+    os.chdir(SCRIPTS_DIR)
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+
+    return 0 if run_pipeline(args.command) else 1
 
 if __name__ == "__main__":
-    run_pipeline()
+    sys.exit(main())
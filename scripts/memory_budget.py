@@ -0,0 +1,110 @@
+"""Memory budget settings and peak-RSS measurement for pipeline stages.
+
+The budget comes from OLIST_MAX_MEMORY (set by `main_pipeline.py --max-memory
+4G`). Stages use it to size read chunks and, in feature engineering, to split
+the order joins into partitions that are spilled to disk and processed one at
+a time. Only the standard library is imported here so main_pipeline.py stays
+lightweight.
+"""
+import os
+import sys
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """Parse sizes such as "4G", "512M", "1.5g" or "1073741824" into bytes."""
+    value = str(text).strip().upper().removesuffix("B")
+    unit = value[-1] if value and value[-1] in UNITS else ""
+    number = value[:-1] if unit else value
+    try:
+        return int(float(number) * UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid memory size: {text!r} (expected e.g. 4G, 512M)") from None
+
+
+def max_memory_bytes():
+    """The configured budget in bytes, or None when no budget is set."""
+    setting = os.environ.get("OLIST_MAX_MEMORY")
+    return parse_size(setting) if setting else None
+
+
+def format_bytes(n):
+    return f"{n / 1024 ** 2:,.0f} MB"
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def rows_per_chunk(budget, bytes_per_row, fraction=0.1, default=250_000, minimum=1_000):
+    """Rows whose in-memory size fits in `fraction` of the budget.
+
+    Returns `default` when there is no budget.
+    """
+    if not budget:
+        return default
+    return max(minimum, int(budget * fraction / max(bytes_per_row, 1)))
+
+
+def chunk_rows(row_bytes, default=250_000):
+    """Rows per chunk for a stage whose rows take about `row_bytes` in memory.
+
+    With a budget set a chunk gets a tenth of it; without one, `default` rows.
+    """
+    return rows_per_chunk(max_memory_bytes(), row_bytes, default=default)
+
+
+def logged(chunks, message):
+    """Pass chunks through, printing `message` for each one.
+
+    The message is formatted with the chunk number `n` and its `rows`, e.g.
+    "Chunk {n}: {rows} rows processed.".
+    """
+    for i, chunk in enumerate(chunks):
+        print(message.format(n=i + 1, rows=len(chunk)))
+        yield chunk
+
+
+def reset_peak_rss():
+    """Reset the peak-RSS high-water mark so the next reading covers one stage.
+
+    Supported on Linux (/proc/self/clear_refs); elsewhere the reading stays
+    the process-wide peak. Returns True when the reset worked.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def peak_child_rss_bytes():
+    """Largest peak RSS of any finished child process (e.g. shard workers), or None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if not peak:
+        return None
+    return peak if sys.platform == "darwin" else peak * 1024
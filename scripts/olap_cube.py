@@ -0,0 +1,204 @@
+"""Pre-aggregated delivery cube.
+
+Additive measures are summed over every combination of
+customer_state x seller_state x category x month x payment_type that occurs in
+the business-ready dataset. Roll-ups and filters are then answered from the
+cube cells alone, without re-reading row-level data:
+
+    cube = load_cube("../data/processed/delivery_cube.npz")
+    query(cube, by=["customer_state"], where={"month": ("2018-01", "2018-06")})
+    query(cube, by=["category", "payment_type"], where={"seller_state": ["SP", "RJ"]})
+
+Dimensions are stored as small integer codes plus a per-dimension dictionary,
+so the saved cube is a few hundred KB even for the full dataset.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import artifact_store
+
+DIMENSIONS = ["customer_state", "seller_state", "category", "month", "payment_type"]
+MEASURES = ["orders", "late", "delay_sum", "payment_sum", "review_sum", "reviewed"]
+
+# Ratios reported alongside the summed measures: name -> (numerator, denominator)
+DERIVED = {
+    "late_rate": ("late", "orders"),
+    "avg_delay_days": ("delay_sum", "orders"),
+    "avg_payment_value": ("payment_sum", "orders"),
+    # Orders without a review carry review_score 0, so average over reviewed orders only
+    "avg_review_score": ("review_sum", "reviewed"),
+}
+
+# Label for a missing dimension value; never matched by a (low, high) range filter
+UNKNOWN = "unknown"
+
+CUBE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "delivery_cube.npz")
+
+
+def load_fact_frame(root=None):
+    """One row per order with the cube dimensions and raw measure columns."""
+    df = artifact_store.read(
+        "eda_business_ready", root=root,
+        usecols=["order_id", "order_purchase_timestamp", "customer_state", "seller_state",
+                 "product_category_name", "review_score", "delivered_late",
+                 "delivery_delay_days", "payment_value"]
+    )
+    translation = artifact_store.read("translation_clean", root=root)
+    payments = artifact_store.read(
+        "order_payment_clean", root=root,
+        usecols=["order_id", "payment_sequential", "payment_type"]
+    )
+
+    df = df.merge(translation, how="left", on="product_category_name")
+    payments_primary = payments.sort_values("payment_sequential").drop_duplicates("order_id")
+    df = df.merge(payments_primary[["order_id", "payment_type"]], how="left", on="order_id")
+
+    purchase = pd.to_datetime(df["order_purchase_timestamp"], errors="coerce")
+    return pd.DataFrame({
+        "month": purchase.dt.strftime("%Y-%m").fillna(UNKNOWN),
+        "customer_state": df["customer_state"].fillna(UNKNOWN),
+        "seller_state": df["seller_state"].fillna(UNKNOWN),
+        "category": df["product_category_name_english"].fillna(df["product_category_name"]).fillna(UNKNOWN),
+        "payment_type": df["payment_type"].fillna(UNKNOWN),
+        "review_score": df["review_score"].fillna(0).astype(int),
+        "late": df["delivered_late"].fillna(0).astype(int),
+        "delay_sum": df["delivery_delay_days"].fillna(0),
+        "payment_value": df["payment_value"].fillna(0),
+    })
+
+
+def _code_dtype(n):
+    return np.uint8 if n <= np.iinfo(np.uint8).max else np.uint16 if n <= np.iinfo(np.uint16).max else np.int32
+
+
+def build_cube(df):
+    """Aggregate load_fact_frame() rows into cube cells.
+
+    Returns a dict with per-dimension "labels" (sorted) and "codes" arrays and
+    one array per measure, all aligned on the cube cells.
+    """
+    labels, codes = {}, {}
+    for dim in DIMENSIONS:
+        cat = pd.Categorical(df[dim].astype(str))
+        labels[dim] = np.asarray(cat.categories, dtype=str)
+        codes[dim] = cat.codes.astype(np.int64)
+
+    key, sizes = _combine_codes([codes[dim] for dim in DIMENSIONS],
+                                [len(labels[dim]) for dim in DIMENSIONS])
+    cells, inverse = np.unique(key, return_inverse=True)
+
+    measures = {
+        "orders": np.bincount(inverse).astype(np.int32),
+        "late": np.bincount(inverse, weights=df["late"].to_numpy()).astype(np.int32),
+        "delay_sum": np.bincount(inverse, weights=df["delay_sum"].to_numpy(dtype=float)),
+        "payment_sum": np.bincount(inverse, weights=df["payment_value"].to_numpy(dtype=float)),
+        "review_sum": np.bincount(inverse, weights=df["review_score"].to_numpy()).astype(np.int32),
+        "reviewed": np.bincount(inverse, weights=(df["review_score"] > 0).to_numpy()).astype(np.int32),
+    }
+
+    cube = {"labels": labels, "codes": {}, "measures": measures}
+    for dim, cell_codes in zip(DIMENSIONS, _split_codes(cells, sizes)):
+        cube["codes"][dim] = cell_codes.astype(_code_dtype(len(labels[dim])))
+    return cube
+
+
+def _combine_codes(code_arrays, sizes):
+    """Mixed-radix key so that a tuple of codes becomes one int64."""
+    key = np.zeros(len(code_arrays[0]), dtype=np.int64)
+    for codes, size in zip(code_arrays, sizes):
+        key = key * size + codes
+    return key, sizes
+
+
+def _split_codes(key, sizes):
+    parts = []
+    for size in reversed(sizes):
+        parts.append(key % size)
+        key = key // size
+    return parts[::-1]
+
+
+def save_cube(cube, path=CUBE_PATH):
+    arrays = {}
+    for dim in DIMENSIONS:
+        arrays[f"labels_{dim}"] = cube["labels"][dim]
+        arrays[f"codes_{dim}"] = cube["codes"][dim]
+    for name in MEASURES:
+        arrays[f"measure_{name}"] = cube["measures"][name]
+    np.savez_compressed(path, **arrays)
+
+
+def load_cube(path=CUBE_PATH):
+    with np.load(path) as data:
+        missing = [name for name in MEASURES if f"measure_{name}" not in data.files]
+        if missing:
+            raise ValueError(f"Cube at {path} lacks measures {missing}; rebuild it with build_cube.py")
+        return {
+            "labels": {dim: data[f"labels_{dim}"] for dim in DIMENSIONS},
+            "codes": {dim: data[f"codes_{dim}"] for dim in DIMENSIONS},
+            "measures": {name: data[f"measure_{name}"] for name in MEASURES},
+        }
+
+
+def _filter_mask(cube, where):
+    """Boolean mask over cube cells for a {dimension: filter} dict.
+
+    A filter is a single value, a list/set of values, or a (low, high) tuple
+    for an inclusive range (useful for "YYYY-MM" months). Ranges, including
+    open-ended ones, never match the UNKNOWN bucket.
+    """
+    n_cells = len(cube["measures"]["orders"])
+    mask = np.ones(n_cells, dtype=bool)
+    for dim, value in (where or {}).items():
+        if dim not in DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension: {dim}")
+        labels = cube["labels"][dim]
+        if isinstance(value, tuple):
+            low, high = value
+            allowed = labels != UNKNOWN
+            if low is not None:
+                allowed &= labels >= str(low)
+            if high is not None:
+                allowed &= labels <= str(high)
+        else:
+            values = [value] if isinstance(value, str) or np.isscalar(value) else list(value)
+            allowed = np.isin(labels, [str(v) for v in values])
+        mask &= allowed[cube["codes"][dim]]
+    return mask
+
+
+def query(cube, by=None, where=None):
+    """Roll the cube up to the `by` dimensions after applying `where` filters.
+
+    Returns a DataFrame with one row per group, the summed MEASURES and the
+    DERIVED ratios. With no `by` dimensions the result is a single total row.
+    """
+    by = list(by or [])
+    unknown = [dim for dim in by if dim not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {unknown}")
+
+    mask = _filter_mask(cube, where)
+    sizes = [len(cube["labels"][dim]) for dim in by]
+    if by:
+        key, _ = _combine_codes([cube["codes"][dim][mask].astype(np.int64) for dim in by], sizes)
+        groups, inverse = np.unique(key, return_inverse=True)
+    else:
+        groups, inverse = np.zeros(1, dtype=np.int64), np.zeros(int(mask.sum()), dtype=np.int64)
+
+    result = {}
+    for dim, codes in zip(by, _split_codes(groups, sizes)):
+        result[dim] = cube["labels"][dim][codes]
+    for name in MEASURES:
+        result[name] = np.bincount(inverse, weights=cube["measures"][name][mask], minlength=len(groups))
+    df = pd.DataFrame(result)
+    df["orders"] = df["orders"].astype(np.int64)
+    df["late"] = df["late"].astype(np.int64)
+    df["reviewed"] = df["reviewed"].astype(np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, (numerator, denominator) in DERIVED.items():
+            df[name] = df[numerator] / df[denominator].where(df[denominator] > 0)
+    return df
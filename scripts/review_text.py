@@ -0,0 +1,370 @@
+"""Review text features: Portuguese normalization, tokenization and hashed bag-of-words.
+
+Review titles and messages are vectorized per order into hashed term counts
+(unigrams and bigrams, N_FEATURES buckets). The sparse vectors are cached
+under data/processed/review_vectors/ as CSR parts keyed by order_id:
+
+    data/processed/review_vectors/
+        manifest.json
+        part-00001.npz     # order_id, fingerprint, token counts, indptr/indices/data
+        part-00002.npz
+        ...
+
+Each run fingerprints every order's review text, keeps the cached rows whose
+fingerprint still matches and vectorizes only new or changed orders, one
+batch of reviews at a time. Term counts are additive, so an order whose
+reviews fall into several batches simply has several rows that are summed
+when the vectors are loaded:
+
+    vectors = load_vectors()
+    rows = align(vectors, df["order_id"])   # CSR arrays in df's row order
+    X_text = to_csr(rows)                   # scipy.sparse matrix (needs scipy)
+"""
+import json
+import os
+import re
+import tempfile
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+N_FEATURES = 2 ** 18
+
+# Bump when normalization or tokenization changes so cached vectors are rebuilt
+TEXT_VERSION = 1
+
+# Incremental runs append a part each; beyond this many the smallest are merged
+MAX_PARTS = 32
+
+# Cap on the estimated memory of one compaction merge (loaded parts plus the
+# summing), and how much a compressed part grows when loaded for it
+MERGE_BYTES = 256 * 1024 ** 2
+PART_EXPANSION = 6
+
+VECTORS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "review_vectors")
+
+TEXT_COLS = ["review_comment_title", "review_comment_message"]
+
+# Common Portuguese function words (accents stripped). Negations such as
+# "nao" and "nunca" are kept on purpose: "nao recebi" is a strong signal.
+STOPWORDS = frozenset("""
+a ao aos as com como da das de del dela dele do dos e ela ele em entre era es essa esse esta este eu
+foi for ha isso isto ja la lhe mas me meu minha na nas nem no nos nossa nosso num numa o os ou para
+pela pelo por pra qual quando que se sem ser seu sua so sao ta tem tambem te tenho um uma uns umas
+vc voce voces
+""".split())
+
+# Tokens that point at delivery problems; counted into review_delivery_terms
+DELIVERY_TERMS = frozenset("""
+atraso atrasado atrasada atrasou atrasos demora demorou demorada demorado prazo entrega entregue
+chegou chegaram recebi recebido recebida ainda aguardando espera esperando extraviado
+""".split())
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+# token -> hashed bucket; the vocabulary is small, so this saves a crc32 per token
+_BUCKETS = {}
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def tokenize(text):
+    """Normalized word tokens without stopwords, digits or single letters."""
+    return [tok for tok in normalize(text).split()
+            if len(tok) > 1 and not tok.isdigit() and tok not in STOPWORDS]
+
+
+def terms(tokens):
+    """Unigrams plus adjacent-token bigrams."""
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def bucket(term):
+    found = _BUCKETS.get(term)
+    if found is None:
+        found = _BUCKETS[term] = zlib.crc32(term.encode("utf-8")) % N_FEATURES
+    return found
+
+
+def review_texts(reviews):
+    """Title and message of each review joined into one string ("" when both are missing)."""
+    cols = [reviews[col].fillna("").astype(str) for col in TEXT_COLS if col in reviews.columns]
+    if not cols:
+        return pd.Series("", index=reviews.index)
+    text = cols[0]
+    for col in cols[1:]:
+        text = text + "\n" + col
+    return text.str.strip()
+
+
+def _text_crcs(texts):
+    return np.fromiter((zlib.crc32(t.encode("utf-8")) for t in texts), dtype=np.uint32, count=len(texts))
+
+
+def sum_fingerprints(order_ids, values):
+    """Per-order sum (mod 2**32) of fingerprint values, as a Series indexed by order_id."""
+    sums = pd.Series(np.asarray(values, dtype=np.uint64), index=np.asarray(order_ids)).groupby(level=0, sort=False).sum()
+    return (sums % 2 ** 32).astype(np.uint32)
+
+
+def fingerprints(reviews):
+    """Per-order fingerprint of review text: the sum (mod 2**32) of per-review crc32s.
+
+    The sum does not depend on row order and can be accumulated across
+    batches with sum_fingerprints(), like the term counts.
+    """
+    return sum_fingerprints(reviews["order_id"].to_numpy(), _text_crcs(review_texts(reviews)))
+
+
+def _sum_rows(order_ids, row_of_entry, indices, data, extras):
+    """Sum CSR entries (and per-row extras) of rows that share an order_id."""
+    codes, uniques = pd.factorize(np.asarray(order_ids))
+    n_rows = len(uniques)
+    entry_rows = codes[row_of_entry]
+    key = entry_rows.astype(np.int64) * N_FEATURES + indices
+    cells, inverse = np.unique(key, return_inverse=True)
+    summed = np.bincount(inverse, weights=data).astype(np.float32)
+    rows = (cells // N_FEATURES).astype(np.int64)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    summed_extras = {}
+    for name, values in extras.items():
+        total = np.bincount(codes, weights=values.astype(np.float64), minlength=n_rows)
+        summed_extras[name] = (total % 2 ** 32 if name == "fingerprint" else total).astype(values.dtype)
+    return {
+        "order_id": np.asarray(uniques, dtype=str),
+        "indptr": indptr,
+        "indices": (cells % N_FEATURES).astype(np.int32),
+        "data": summed,
+        **summed_extras,
+    }
+
+
+def vectorize(reviews):
+    """Hashed term counts per order for a batch of reviews.
+
+    Returns a CSR dict with order_id, indptr, indices, data and per-order
+    fingerprint, token_count and delivery_terms arrays.
+    """
+    texts = review_texts(reviews)
+    row_of_entry, indices = [], []
+    token_count = np.zeros(len(reviews), dtype=np.int32)
+    delivery_terms = np.zeros(len(reviews), dtype=np.int32)
+    for i, text in enumerate(texts):
+        tokens = tokenize(text) if text else []
+        token_count[i] = len(tokens)
+        delivery_terms[i] = sum(tok in DELIVERY_TERMS for tok in tokens)
+        buckets = [bucket(term) for term in terms(tokens)]
+        indices.extend(buckets)
+        row_of_entry.extend([i] * len(buckets))
+
+    crc = _text_crcs(texts)
+    return _sum_rows(
+        reviews["order_id"].to_numpy(),
+        np.asarray(row_of_entry, dtype=np.int64),
+        np.asarray(indices, dtype=np.int64),
+        np.ones(len(indices), dtype=np.float32),
+        {"fingerprint": crc, "token_count": token_count, "delivery_terms": delivery_terms},
+    )
+
+
+# =============== Cache ===============
+
+def read_manifest(directory=VECTORS_DIR):
+    path = os.path.join(directory, "manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest, directory):
+    fd, tmp = tempfile.mkstemp(prefix=".manifest.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, "manifest.json"))
+
+
+def _save_part(part, path):
+    fd, tmp = tempfile.mkstemp(prefix=".part.", suffix=".npz.tmp", dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        np.savez_compressed(f, **part)
+    os.replace(tmp, path)
+
+
+def _load_part(path, keys=None):
+    with np.load(path) as data:
+        return {key: data[key] for key in (keys or data.files)}
+
+
+def _select_rows(part, keep):
+    """Copy of a CSR part with only the rows where `keep` is True."""
+    lengths = np.diff(part["indptr"])
+    entries = np.repeat(keep, lengths)
+    indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+    np.cumsum(lengths[keep], out=indptr[1:])
+    selected = {key: values[keep] for key, values in part.items() if key not in ("indptr", "indices", "data")}
+    return {**selected, "indptr": indptr, "indices": part["indices"][entries], "data": part["data"][entries]}
+
+
+def open_cache(directory=VECTORS_DIR):
+    """The cache manifest, starting a new cache when there is none or its settings changed."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    settings = {"text_version": TEXT_VERSION, "n_features": N_FEATURES}
+    if manifest is None or any(manifest.get(key) != value for key, value in settings.items()):
+        for name in os.listdir(directory):
+            if name.startswith("part-") or name.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))
+        manifest = {**settings, "next_part": 1, "parts": []}
+        _write_manifest(manifest, directory)
+    return manifest
+
+
+def cached_fingerprints(manifest, directory=VECTORS_DIR):
+    """Fingerprint per cached order_id, summed over the parts it appears in."""
+    parts = [_load_part(os.path.join(directory, name), ["order_id", "fingerprint"]) for name in manifest["parts"]]
+    if not parts:
+        return pd.Series(dtype=np.uint32)
+    return sum_fingerprints(np.concatenate([part["order_id"] for part in parts]),
+                            np.concatenate([part["fingerprint"] for part in parts]))
+
+
+def drop_orders(manifest, stale, directory=VECTORS_DIR):
+    """Rewrite the cache parts without the rows of `stale` order_ids."""
+    stale = pd.Index(stale)
+    kept_parts = []
+    for name in manifest["parts"]:
+        path = os.path.join(directory, name)
+        part = _load_part(path)
+        keep = ~pd.Index(part["order_id"]).isin(stale)
+        if keep.all():
+            kept_parts.append(name)
+        elif keep.any():
+            _save_part(_select_rows(part, keep), path)
+            kept_parts.append(name)
+    manifest["parts"] = kept_parts
+    _write_manifest(manifest, directory)
+    for name in os.listdir(directory):
+        if name.startswith("part-") and name not in kept_parts:
+            os.remove(os.path.join(directory, name))
+
+
+def append_part(manifest, part, directory=VECTORS_DIR):
+    name = f"part-{manifest['next_part']:05d}.npz"
+    _save_part(part, os.path.join(directory, name))
+    manifest["next_part"] += 1
+    manifest["parts"].append(name)
+    _write_manifest(manifest, directory)
+    return name
+
+
+def _merge_parts(parts):
+    """One CSR dict with a single row per order_id from several parts."""
+    row_lengths = np.concatenate([np.diff(part["indptr"]) for part in parts])
+    return _sum_rows(
+        np.concatenate([part["order_id"] for part in parts]),
+        np.repeat(np.arange(len(row_lengths)), row_lengths),
+        np.concatenate([part["indices"] for part in parts]).astype(np.int64),
+        np.concatenate([part["data"] for part in parts]),
+        {key: np.concatenate([part[key] for part in parts])
+         for key in ("fingerprint", "token_count", "delivery_terms")},
+    )
+
+
+def compact(manifest, max_parts=MAX_PARTS, max_bytes=MERGE_BYTES, directory=VECTORS_DIR):
+    """Merge the smallest parts while incremental runs have left more than max_parts.
+
+    Each merge loads only as many parts as bring the count back to max_parts
+    and whose estimated in-memory size fits in max_bytes, so compaction stays
+    bounded however large the cache grows. Parts too large to merge under the
+    cap are left alone. Returns the number of parts merged away.
+    """
+    merged = 0
+    while len(manifest["parts"]) > max_parts:
+        sizes = sorted((os.path.getsize(os.path.join(directory, name)) * PART_EXPANSION, name)
+                       for name in manifest["parts"])
+        group, total = [], 0
+        for size, name in sizes[:len(sizes) - max_parts + 1]:
+            if total + size > max_bytes:
+                break
+            group.append(name)
+            total += size
+        if len(group) < 2:
+            break
+
+        name = f"part-{manifest['next_part']:05d}.npz"
+        _save_part(_merge_parts([_load_part(os.path.join(directory, old)) for old in group]),
+                   os.path.join(directory, name))
+        manifest["next_part"] += 1
+        manifest["parts"] = [old for old in manifest["parts"] if old not in group] + [name]
+        _write_manifest(manifest, directory)
+        for old in group:
+            os.remove(os.path.join(directory, old))
+        merged += len(group) - 1
+    return merged
+
+
+def load_vectors(directory=VECTORS_DIR):
+    """All cached vectors as one CSR dict with a single row per order_id.
+
+    This loads the whole cache; the stage itself only needs load_summary().
+    """
+    manifest = read_manifest(directory)
+    if manifest is None or not manifest["parts"]:
+        raise FileNotFoundError("No cached review vectors; run review_text_features.py first")
+    return _merge_parts([_load_part(os.path.join(directory, name)) for name in manifest["parts"]])
+
+
+def load_summary(directory=VECTORS_DIR):
+    """Dense per-order text features, cheap to join on order_id.
+
+    Reads only the per-order counts, not the sparse term vectors.
+    """
+    manifest = read_manifest(directory)
+    parts = [_load_part(os.path.join(directory, name), ["order_id", "token_count", "delivery_terms"])
+             for name in (manifest or {}).get("parts", [])]
+    columns = ["order_id", "review_token_count", "review_delivery_terms"]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame({
+        "order_id": np.concatenate([part["order_id"] for part in parts]),
+        "review_token_count": np.concatenate([part["token_count"] for part in parts]),
+        "review_delivery_terms": np.concatenate([part["delivery_terms"] for part in parts]),
+    })
+    return df.groupby("order_id", sort=False, as_index=False)[columns[1:]].sum()
+
+
+def align(vectors, order_ids):
+    """CSR rows reordered to `order_ids`; orders without reviews get empty rows."""
+    position = pd.Index(vectors["order_id"]).get_indexer(np.asarray(order_ids, dtype=str))
+    found = position >= 0
+    lengths = np.zeros(len(position), dtype=np.int64)
+    lengths[found] = np.diff(vectors["indptr"])[position[found]]
+    indptr = np.zeros(len(position) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    starts = vectors["indptr"][position[found]]
+    take = np.repeat(starts - indptr[:-1][found], lengths[found]) + np.arange(indptr[-1])
+    return {
+        "order_id": np.asarray(order_ids, dtype=str),
+        "indptr": indptr,
+        "indices": vectors["indices"][take],
+        "data": vectors["data"][take],
+    }
+
+
+def to_csr(vectors):
+    """scipy.sparse.csr_matrix of a CSR dict (needs `pip install scipy`)."""
+    try:
+        from scipy.sparse import csr_matrix
+    except ImportError:
+        raise ValueError("to_csr() needs scipy (pip install scipy)") from None
+    return csr_matrix((vectors["data"], vectors["indices"], vectors["indptr"]),
+                      shape=(len(vectors["indptr"]) - 1, N_FEATURES))
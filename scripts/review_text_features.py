@@ -0,0 +1,50 @@
+import pandas as pd
+import artifact_store
+import memory_budget
+import review_text
+
+# A review row (ids plus title and message text) takes about 400 bytes in memory
+BATCH_ROWS = memory_budget.chunk_rows(400, default=50_000)
+
+READ_COLS = {"order_id", *review_text.TEXT_COLS}
+
+
+def read_batches():
+    return artifact_store.iter_chunks("order_review_clean", BATCH_ROWS, usecols=lambda col: col in READ_COLS)
+
+
+print("\nFingerprinting review text per order...")
+partial = pd.concat([review_text.fingerprints(batch) for batch in read_batches()])
+current = review_text.sum_fingerprints(partial.index, partial.to_numpy())
+del partial
+
+manifest = review_text.open_cache()
+cached = review_text.cached_fingerprints(manifest)
+matching = cached.reindex(current.index) == current
+todo = current.index[~matching.to_numpy()]
+stale = cached.index.difference(current.index[matching.to_numpy()])
+print(f"{len(current)} orders with reviews: {len(current) - len(todo)} cached, {len(todo)} to vectorize.")
+
+if len(stale):
+    print(f"Dropping {len(stale)} changed or removed orders from the vector cache...")
+    review_text.drop_orders(manifest, stale)
+
+if len(todo):
+    print("\nNormalizing, tokenizing and hashing review text in batches...")
+    for i, batch in enumerate(read_batches()):
+        batch = batch[batch["order_id"].isin(todo)]
+        if batch.empty:
+            continue
+        name = review_text.append_part(manifest, review_text.vectorize(batch))
+        print(f"Batch {i + 1}: {len(batch)} reviews vectorized into {name}.")
+
+# With a budget, one compaction merge may use a quarter of it
+budget = memory_budget.max_memory_bytes()
+merged = review_text.compact(manifest, max_bytes=budget // 4 if budget else review_text.MERGE_BYTES)
+if merged:
+    print(f"Compacted the vector cache: {merged} parts merged away, {len(manifest['parts'])} left.")
+
+summary = review_text.load_summary()
+entry = artifact_store.write("review_text_features", summary, stage="review_text_features")
+print(f"\nReview vectors cached in: ../data/processed/review_vectors ({len(manifest['parts'])} parts)")
+print(f"Per-order text features saved: {(entry['rows'], entry['columns'])}\n")
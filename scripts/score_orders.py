@@ -0,0 +1,36 @@
+import os
+import time
+import pandas as pd
+import artifact_store
+import delivery_model
+import memory_budget
+
+# Artifact name or CSV path of the orders to score (OLIST_SCORE_INPUT)
+SCORE_INPUT = os.environ.get("OLIST_SCORE_INPUT", "final_ml_ready")
+
+# An ML-ready row takes about 1 KB in memory
+BATCH_ROWS = memory_budget.chunk_rows(1_000, default=100_000)
+
+
+def read_chunks(columns):
+    wanted = set(columns)
+    if SCORE_INPUT.endswith(".csv"):
+        with pd.read_csv(SCORE_INPUT, chunksize=BATCH_ROWS, usecols=lambda col: col in wanted) as reader:
+            yield from reader
+    else:
+        yield from artifact_store.iter_chunks(SCORE_INPUT, BATCH_ROWS, usecols=lambda col: col in wanted)
+
+
+print("\nLoading trained delivery model...")
+model = delivery_model.load_model()
+print(f"Model trained at {model['trained_at']} on {model['train_rows']} orders.")
+
+print(f"\nScoring {SCORE_INPUT} in batches of up to {BATCH_ROWS} orders...")
+start = time.perf_counter()
+chunks = read_chunks(["order_id"] + delivery_model.feature_names(model["spec"]))
+scores = memory_budget.logged(delivery_model.score_chunks(model, chunks), "Batch {n}: {rows} orders scored.")
+entry = artifact_store.write("delivery_late_scores", scores, stage="score_orders")
+elapsed = time.perf_counter() - start
+
+print(f"\nScored {entry['rows']} orders in {elapsed:.2f}s ({entry['rows'] / elapsed:,.0f} rows/s).")
+print(f"Scores saved to: ../data/processed/delivery_late_scores/{entry['file']}\n")
@@ -0,0 +1,41 @@
+import os
+import artifact_store
+import delivery_model
+import memory_budget
+
+# OpenMP threads for training (OLIST_MODEL_THREADS; default: all cores)
+THREADS = int(os.environ.get("OLIST_MODEL_THREADS", "0")) or None
+
+# First purchase date of the test set, e.g. 2018-06-01; by default the latest
+# 20% of orders are held out
+TEST_START = os.environ.get("OLIST_TEST_START")
+
+print("\nLoading ML-ready dataset and purchase times...")
+df = artifact_store.read("final_ml_ready")
+purchase_times = delivery_model.load_purchase_times().reindex(df["order_id"]).to_numpy()
+train_mask, test_mask, cutoff = delivery_model.time_split(purchase_times, TEST_START)
+print(f"Time-based split at {cutoff:%Y-%m-%d}: {train_mask.sum()} train / {test_mask.sum()} test orders")
+
+print("\nBuilding float32 feature matrix...")
+spec = delivery_model.feature_spec(df[train_mask])
+if spec["skipped"]:
+    print(f"Skipping non-numeric columns: {', '.join(spec['skipped'])}")
+X = delivery_model.to_matrix(df, spec)
+y = df[delivery_model.TARGET].to_numpy()
+del df
+print(f"Features: {len(spec['numeric'])} numeric, {len(spec['categorical'])} categorical "
+      f"({X.shape[0]} x {X.shape[1]}, {memory_budget.format_bytes(X.nbytes)})")
+
+print(f"\nTraining histogram gradient boosting (threads: {THREADS or 'all cores'})...")
+model = delivery_model.train(X[train_mask], y[train_mask], spec, threads=THREADS)
+print(f"Trained in {model['train_seconds']:.2f}s "
+      f"({model['train_rows'] / model['train_seconds']:,.0f} rows/s, {model['estimator'].n_iter_} iterations)")
+
+model["test_start"] = cutoff.isoformat()
+model["metrics"] = delivery_model.evaluate(model, X[test_mask], y[test_mask])
+print("\nTest metrics (orders after the split):")
+for name, value in model["metrics"].items():
+    print(f"{name}: {value if value is None or isinstance(value, int) else round(value, 4)}")
+
+delivery_model.save_model(model)
+print(f"\nModel saved to: {delivery_model.MODEL_PATH}\n")
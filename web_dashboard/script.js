@@ -71,18 +71,177 @@ document.addEventListener("DOMContentLoaded", () => {
     },
   };
 
+  // Client-side charts drawn from the JSON aggregates written by
+  // scripts/dashboard_export.py. When served by scripts/dashboard_server.py
+  // the charts can also be filtered by month range and customer state.
+  const chartCards = document.querySelectorAll(".plot-card[data-chart]");
+  const renderedCharts = {};
+
+  function escapeHtml(text) {
+    return String(text).replace(/[&<>"]/g, (c) => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;" })[c]);
+  }
+
+  function formatValue(value, format) {
+    if (format === "percent") return `${value.toFixed(1)}%`;
+    if (format === "ratio") return value.toFixed(2);
+    return Number.isInteger(value) ? value.toLocaleString() : value.toFixed(1);
+  }
+
+  function renderChart(spec) {
+    const { type, labels, values, format } = spec;
+    const max = Math.max(...values, 0) || 1;
+    const color = getComputedStyle(document.documentElement).getPropertyValue("--accent-color").trim() || "#0da493";
+    let width = 600;
+    let height = 340;
+    let body = "";
+
+    if (!labels.length) {
+      height = 120;
+      body = `<text x="${width / 2}" y="${height / 2}" text-anchor="middle" font-size="13" fill="#64748b">No orders match these filters</text>`;
+    } else if (type === "hbar") {
+      const left = 150;
+      const row = 22;
+      height = labels.length * row + 40;
+      labels.forEach((label, i) => {
+        const y = 20 + i * row;
+        const w = ((width - left - 70) * Math.max(values[i], 0)) / max;
+        body += `<text x="${left - 8}" y="${y + 14}" text-anchor="end" font-size="12">${escapeHtml(label)}</text>`;
+        body += `<rect x="${left}" y="${y}" width="${w}" height="${row - 6}" fill="${color}" rx="3"/>`;
+        body += `<text x="${left + w + 6}" y="${y + 14}" font-size="11">${formatValue(values[i], format)}</text>`;
+      });
+    } else {
+      const left = 50;
+      const bottom = height - 60;
+      const step = (width - left - 20) / Math.max(labels.length, 1);
+      const yOf = (v) => bottom - ((bottom - 30) * Math.max(v, 0)) / max;
+      const points = [];
+      labels.forEach((label, i) => {
+        const x = left + i * step + step / 2;
+        if (type === "line") {
+          points.push(`${x},${yOf(values[i])}`);
+          body += `<circle cx="${x}" cy="${yOf(values[i])}" r="3.5" fill="${color}"><title>${escapeHtml(label)}: ${formatValue(values[i], format)}</title></circle>`;
+        } else {
+          body += `<rect x="${x - step * 0.35}" y="${yOf(values[i])}" width="${step * 0.7}" height="${bottom - yOf(values[i])}" fill="${color}" rx="3"/>`;
+          body += `<text x="${x}" y="${yOf(values[i]) - 6}" text-anchor="middle" font-size="12">${formatValue(values[i], format)}</text>`;
+        }
+        const every = Math.ceil(labels.length / 12);
+        if (i % every === 0) {
+          body += `<text x="${x}" y="${bottom + 16}" text-anchor="end" font-size="11" transform="rotate(-35 ${x} ${bottom + 16})">${escapeHtml(label)}</text>`;
+        }
+      });
+      if (points.length) {
+        body = `<polyline points="${points.join(" ")}" fill="none" stroke="${color}" stroke-width="2"/>` + body;
+      }
+      body += `<line x1="${left}" y1="${bottom}" x2="${width - 20}" y2="${bottom}" stroke="#cbd5e1"/>`;
+      body += `<text x="14" y="${(bottom + 30) / 2}" font-size="12" transform="rotate(-90 14 ${(bottom + 30) / 2})" text-anchor="middle">${escapeHtml(spec.y_label)}</text>`;
+    }
+
+    return `<svg class="chart-svg" viewBox="0 0 ${width} ${height}" role="img" aria-label="${escapeHtml(spec.title)}">
+      <title>${escapeHtml(spec.title)}</title>${body}</svg>`;
+  }
+
+  function drawChart(card, spec) {
+    let container = card.querySelector(".chart-container");
+    if (!container) {
+      container = document.createElement("div");
+      container.className = "chart-container";
+      card.insertBefore(container, card.querySelector(".card-content"));
+    }
+    card.querySelector("img").style.display = "none";
+    container.innerHTML = renderChart(spec);
+    renderedCharts[card.dataset.plot] = spec;
+  }
+
+  function showFallbackImage(card) {
+    const img = card.querySelector("img");
+    if (!img.src) img.src = img.dataset.src;
+  }
+
+  // Static hosts may serve .json.gz without Content-Encoding, so decompress here when needed
+  async function readJson(response) {
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+      const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+      return JSON.parse(await new Response(stream).text());
+    }
+    return JSON.parse(new TextDecoder().decode(bytes));
+  }
+
+  async function loadStaticCharts() {
+    await Promise.all(
+      [...chartCards].map(async (card) => {
+        try {
+          const response = await fetch(`data/${card.dataset.plot}.json.gz`);
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          drawChart(card, await readJson(response));
+        } catch (err) {
+          showFallbackImage(card);
+        }
+      })
+    );
+  }
+
+  async function loadFilteredCharts(params) {
+    const response = await fetch(`api/charts?${new URLSearchParams(params)}`);
+    const charts = await response.json();
+    chartCards.forEach((card) => {
+      const spec = charts[card.dataset.plot];
+      if (spec) drawChart(card, spec);
+      else showFallbackImage(card);
+    });
+  }
+
+  function fillSelect(select, options, blankLabel) {
+    select.innerHTML = `<option value="">${blankLabel}</option>` +
+      options.map((o) => `<option value="${escapeHtml(o)}">${escapeHtml(o)}</option>`).join("");
+  }
+
+  async function initCharts() {
+    let options = null;
+    try {
+      const response = await fetch("api/filters");
+      if (response.ok) options = await response.json();
+    } catch (err) {
+      options = null;
+    }
+    if (!options) return loadStaticCharts();
+
+    const start = document.getElementById("filterStart");
+    const end = document.getElementById("filterEnd");
+    const state = document.getElementById("filterState");
+    fillSelect(start, options.months, "First month");
+    fillSelect(end, options.months, "Last month");
+    fillSelect(state, options.states, "All states");
+    document.getElementById("chartFilters").hidden = false;
+    document.getElementById("applyFilters").addEventListener("click", () => {
+      const params = {};
+      if (start.value) params.start = start.value;
+      if (end.value) params.end = end.value;
+      if (state.value) params.state = state.value;
+      loadFilteredCharts(params).catch(() => chartCards.forEach(showFallbackImage));
+    });
+    return loadFilteredCharts({}).catch(() => loadStaticCharts());
+  }
+
+  initCharts();
+
   const modal = document.getElementById("plotModal");
   const closeModalBtn = document.getElementById("closeModal");
   const modalPlotImg = document.getElementById("modalPlotImg");
   const modalPlotTitle = document.getElementById("modalPlotTitle");
   const modalPlotSummary = document.getElementById("modalPlotSummary");
 
+  const modalPlotChart = document.getElementById("modalPlotChart");
+
   document.querySelectorAll(".plot-card").forEach((card) => {
     card.addEventListener("click", () => {
       const plotKey = card.getAttribute("data-plot");
       const plotInfo = plotSummaries[plotKey];
       if (plotInfo) {
-        modalPlotImg.src = plotInfo.img;
+        const chart = renderedCharts[plotKey];
+        modalPlotChart.innerHTML = chart ? renderChart(chart) : "";
+        modalPlotImg.style.display = chart ? "none" : "";
+        if (!chart) modalPlotImg.src = plotInfo.img;
         modalPlotImg.alt = plotInfo.title;
         modalPlotTitle.textContent = plotInfo.title;
         modalPlotSummary.textContent = plotInfo.summary;